@@ -2,13 +2,23 @@ from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
+import asyncio
+import hashlib
+import json
 import logging
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from cachetools import LRUCache
 from PIL import Image
 import inference
 
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,6 +27,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger("dfdetect")
 
+# Micro-batching configuration: concurrent requests arriving within
+# MAX_BATCH_WAIT_MS of each other are run through the model together
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 16))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", 10))
+# Number of batches run concurrently, each on its own thread and ONNX Runtime
+# session. Each session runs on INTRA_OP_NUM_THREADS cores, scale across
+# processes with uvicorn --workers.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 4))
+
+# Largest accepted upload, larger files are rejected before they are read in full
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+
+# Prediction results are cached by the hash of the uploaded file, so images
+# submitted again skip inference. Set RESULT_CACHE_REDIS_URL to share the
+# cache between workers and instances.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 86400))
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL")
+
+result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE)
+redis_result_cache = None
+
+# Queue of (decoded image, future) pairs consumed by batch_worker()
+batch_queue = None
+batch_worker_tasks = []
+# Threads the model runs on, one per batch worker
+inference_executor = None
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Deepfake Detection API",
@@ -33,22 +71,150 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def batch_worker():
+    """
+    Background task that coalesces queued images into batches.
+
+    Waits for the first queued image, then keeps collecting images until
+    the batch is full or MAX_BATCH_WAIT_MS has elapsed. The whole batch is
+    preprocessed into one input tensor, run through the model at once and
+    each result is handed back to the request that queued it.
+    """
+    loop = asyncio.get_running_loop()
+    max_batch_size = inference.get_max_batch_size(MAX_BATCH_SIZE)
+    logger.info(f"Batch worker started: max_batch_size={max_batch_size}, max_wait={MAX_BATCH_WAIT_MS}ms")
+
+    while True:
+        items = [await batch_queue.get()]
+        deadline = loop.time() + MAX_BATCH_WAIT_MS / 1000
+
+        # Drain the queue until the batch is full or the wait window closes
+        while len(items) < max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(batch_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        images, futures = zip(*items)
+        try:
+            # Preprocess and run the model in a thread so the event loop keeps
+            # accepting requests
+            scores = await loop.run_in_executor(inference_executor, inference.run_images, images)
+        except Exception as e:
+            logger.error(f"Batch inference failed: {str(e)}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        logger.debug(f"Ran batch of {len(items)} images")
+        for future, image_scores in zip(futures, scores):
+            if not future.done():
+                future.set_result(inference.postprocess(image_scores))
+
+async def predict_batched(image):
+    """
+    Queue an image for batched inference and wait for its prediction.
+
+    Args:
+        image: Decoded image, see inference.decode_image()
+
+    Returns:
+        list: Prediction results, see inference.predict()
+    """
+    future = asyncio.get_running_loop().create_future()
+    await batch_queue.put((image, future))
+    return await future
+
+def get_cache_key(contents):
+    """
+    Get the result cache key of an uploaded file.
+
+    Uses an exact hash of the file rather than a perceptual one, so a
+    cached result is only returned for the very same image.
+
+    Args:
+        contents: Raw bytes of the uploaded file
+
+    Returns:
+        str: Cache key, namespaced by the model
+    """
+    return f"dfdetect:{inference.MODEL_NAME}:{hashlib.blake2b(contents, digest_size=16).hexdigest()}"
+
+async def get_cached_predictions(key):
+    """
+    Look up the prediction results of a file, locally first and then in Redis.
+
+    Args:
+        key: Cache key, see get_cache_key()
+
+    Returns:
+        list: Cached prediction results, or None on a cache miss
+    """
+    predictions = result_cache.get(key)
+    if predictions is None and redis_result_cache is not None:
+        try:
+            cached = await redis_result_cache.get(key)
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            return None
+        if cached is not None:
+            predictions = json.loads(cached)
+            result_cache[key] = predictions
+    return predictions
+
+async def cache_predictions(key, predictions):
+    """
+    Store the prediction results of a file in the result cache.
+
+    Args:
+        key: Cache key, see get_cache_key()
+        predictions: Prediction results to cache
+    """
+    result_cache[key] = predictions
+    if redis_result_cache is not None:
+        try:
+            await redis_result_cache.set(key, json.dumps(predictions), ex=RESULT_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Result cache update failed: {str(e)}")
+
 # Start-up event
 @app.on_event("startup")
 async def startup_event():
+    global batch_queue, batch_worker_tasks, inference_executor, redis_result_cache
     logger.info("Starting deepfake detection service")
     # Load model on startup
     try:
-        inference.initialize_model()
+        inference.initialize_model(max_batch_size=MAX_BATCH_SIZE)
         logger.info("Model loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load model: {str(e)}")
         raise e
 
+    # Start the micro-batching workers
+    inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    batch_queue = asyncio.Queue()
+    batch_worker_tasks = [asyncio.create_task(batch_worker()) for _ in range(INFERENCE_WORKERS)]
+
+    if RESULT_CACHE_REDIS_URL:
+        if aioredis is None:
+            logger.warning("redis is not installed, result cache is not shared")
+        else:
+            redis_result_cache = aioredis.from_url(RESULT_CACHE_REDIS_URL)
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down deepfake detection service")
+    for task in batch_worker_tasks:
+        task.cancel()
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False)
+    if redis_result_cache is not None:
+        await redis_result_cache.aclose()
 
 # Health check endpoint
 @app.get("/health")
@@ -102,19 +268,48 @@ async def predict_image(file: UploadFile = File(...)):
                 detail=f"Invalid file format. Supported formats: {', '.join(allowed_extensions)}"
             )
         
-        # Read image file
-        contents = await file.read()
+        # Read image file, at most one byte more than allowed to detect larger files
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size: {MAX_UPLOAD_BYTES} bytes")
+        contents = await file.read(MAX_UPLOAD_BYTES + 1)
+        if len(contents) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size: {MAX_UPLOAD_BYTES} bytes")
+
+        # Return the result of an earlier upload of the same file
+        cache_key = get_cache_key(contents)
+        predictions = await get_cached_predictions(cache_key)
+        if predictions is not None:
+            processing_time = time.time() - start_time
+            logger.info(f"Prediction served from cache: file={file.filename}, time={processing_time:.2f}s")
+            return {
+                "success": True,
+                "predictions": predictions,
+                "processing_time": processing_time,
+                "cached": True
+            }
         
         # Process image with model
         try:
-            image = Image.open(BytesIO(contents)).convert('RGB')
+            if inference.ENABLE_EMBEDDED_PREPROCESSING:
+                # The model decodes the image itself, only the header is
+                # parsed here to reject invalid files
+                Image.open(BytesIO(contents))
+            else:
+                image = inference.decode_image(contents)
         except Exception as e:
             logger.error(f"Failed to process image: {str(e)}")
             raise HTTPException(status_code=400, detail="Invalid image format or corrupted file")
         
-        # Run inference
-        predictions = inference.predict(image)
+        if inference.ENABLE_EMBEDDED_PREPROCESSING:
+            # Hand the raw bytes to the model, one image per run
+            loop = asyncio.get_running_loop()
+            predictions = await loop.run_in_executor(inference_executor, inference.predict_bytes, contents)
+        else:
+            # Run inference, batched with other concurrent requests
+            predictions = await predict_batched(image)
         
+        await cache_predictions(cache_key, predictions)
+
         # Calculate processing time
         processing_time = time.time() - start_time
         
@@ -126,7 +321,8 @@ async def predict_image(file: UploadFile = File(...)):
         return {
             "success": True,
             "predictions": predictions,
-            "processing_time": processing_time
+            "processing_time": processing_time,
+            "cached": False
         }
     
     except HTTPException as e:
@@ -161,4 +357,16 @@ async def root():
     }
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=5555, reload=False)
\ No newline at end of file
+    # One process per group of cores the inference threads of a process use,
+    # so processes * INFERENCE_WORKERS * INTRA_OP_NUM_THREADS stays at the core count
+    cores_per_worker = INFERENCE_WORKERS * inference.INTRA_OP_NUM_THREADS
+    default_workers = max(1, (os.cpu_count() or 1) // cores_per_worker)
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=5555,
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers)),
+        loop="uvloop",
+        http="httptools",
+        access_log=False
+    )
\ No newline at end of file
@@ -1,24 +1,422 @@
+import cv2
 import numpy as np
 import onnxruntime
 import os
+import threading
+from io import BytesIO
 from PIL import Image
 import logging
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import onnxruntime_extensions
+except ImportError:
+    onnxruntime_extensions = None
+
+try:
+    import tritonclient.http as triton_http
+except ImportError:
+    triton_http = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    # SIMD libjpeg-turbo decoder, used for JPEG uploads
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    # PyTurboJPEG not installed or libturbojpeg not found, decode with PIL
+    _turbo_jpeg = None
+
 # Configure logging
 logger = logging.getLogger("dfdetect.inference")
 
 # Global variables
 MODEL_NAME = "ResNet18" # "ResNet18_unoptimized"
 MODEL_PATH = os.path.join("model", f"{MODEL_NAME}.onnx")
+# Half-precision copy of the model with float32 inputs/outputs, created by
+# scripts/convert_to_onnx.py --fp16. Used instead of MODEL_PATH when running on GPU.
+FP16_MODEL_PATH = os.path.join("model", f"{MODEL_NAME}_fp16.onnx")
+# Graph-optimized copies of the model written by ONNX Runtime on first start,
+# one per execution provider since the optimizations are hardware specific
+OPTIMIZED_MODEL_PATH = os.path.join("model", "{model}.{provider}.optimized.onnx")
+# Run the model on a Triton Inference Server instead of in-process, e.g.
+# TRITON_URL=localhost:8000. The model repository is in triton/.
+TRITON_URL = os.getenv("TRITON_URL")
+TRITON_MODEL_NAME = os.getenv("TRITON_MODEL_NAME", "resnet18")
+# Graph optimizations applied when loading the model: "all" (cached, see
+# above), or "basic" for models simplified at export that are loaded where
+# the model directory isn't writable, e.g. short-lived serverless instances
+GRAPH_OPTIMIZATION_LEVEL = os.getenv("GRAPH_OPTIMIZATION_LEVEL", "all")
+# TensorRT engines are cached separately, TensorRT builds are very slow
+TRT_CACHE_PATH = os.path.join("model", "trt_cache")
+# Capture the CUDA kernel sequence once and replay it for every run. Requires
+# every run to have the same shape, so batches are padded to a fixed size.
+ENABLE_CUDA_GRAPH = os.getenv("ENABLE_CUDA_GRAPH", "False") == "True"
+# Model with image decoding and preprocessing embedded as onnxruntime-extensions
+# ops, created by scripts/convert_to_onnx.py --embed_preprocessing. It takes the
+# raw bytes of the uploaded file, so no image work is done in Python.
+E2E_MODEL_PATH = os.path.join("model", f"{MODEL_NAME}_e2e.onnx")
+ENABLE_EMBEDDED_PREPROCESSING = os.getenv("ENABLE_EMBEDDED_PREPROCESSING", "False") == "True"
 INPUT_SIZE = (224, 224)  # Model input dimensions
 LABELS = ["real", "deepfake"]  # Class labels
 # Pre-compute ImageNet mean and std for faster processing
 IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape((1, 1, 3))
 IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape((1, 1, 3))
+# Fold /255 and mean/std normalization into one per-channel multiply-add (CHW layout)
+NORM_SCALE = (1.0 / (255.0 * IMAGENET_STD)).reshape((3, 1, 1))
+NORM_BIAS = (-IMAGENET_MEAN / IMAGENET_STD).reshape((3, 1, 1))
+# Models exported with the mean/std normalization in the graph only need scaling to [0,1]
+UNIT_SCALE = np.full((3, 1, 1), 1.0 / 255.0, dtype=np.float32)
+ZERO_BIAS = np.zeros((3, 1, 1), dtype=np.float32)
+
+# Threads each session uses within an operator. Inference runs on several
+# sessions concurrently, one per thread, so each gets few threads to avoid
+# oversubscribing the cores.
+INTRA_OP_NUM_THREADS = int(os.getenv("INTRA_OP_NUM_THREADS", 1))
+
+# ONNX Runtime session created by initialize_model(), used to inspect the model
+SESSION = None
+# Model file and providers the per-thread sessions are created from, and
+# whether that file is already graph-optimized
+_SESSION_MODEL_PATH = None
+_SESSION_PROVIDERS = None
+_SESSION_PREOPTIMIZED = False
+# Model input/output names, batch size if the batch dimension is fixed and
+# number of outputs, read once by initialize_model() instead of per run
+INPUT_NAME = None
+OUTPUT_NAME = None
+FIXED_BATCH_SIZE = None
+NUM_OUTPUTS = len(LABELS)
+# Batch size the CUDA graph of every session is captured with
+CUDA_GRAPH_BATCH_SIZE = None
+# Whether the model has the softmax built in, see scripts/convert_to_onnx.py.
+# Read from the model metadata, older models output logits.
+OUTPUT_IS_PROBABILITIES = False
+# Per-channel scale and bias applied by normalize_into(), depending on whether
+# the model does the ImageNet normalization itself (read from the metadata)
+INPUT_SCALE = NORM_SCALE
+INPUT_BIAS = NORM_BIAS
+# Per-thread inference state, see _get_thread_state(): the session, its
+# IOBinding to preallocated input/output buffers, which grow to the largest
+# batch seen so steady-state inference allocates nothing, and the device-side
+# tensors its captured CUDA graph reads from and writes to
+_thread_local = threading.local()
+# Whether the model is ready on the Triton server, and the largest batch it accepts
+TRITON_MODEL_READY = False
+TRITON_MAX_BATCH_SIZE = None
+# Session of the model with embedded preprocessing, if enabled, and its input name
+E2E_SESSION = None
+E2E_INPUT_NAME = None
+
+def _get_providers():
+    """
+    Build the execution provider list, preferring TensorRT, then CUDA, then CPU.
+
+    Returns:
+        list: Providers in priority order, as accepted by InferenceSession
+    """
+    available = onnxruntime.get_available_providers()
+    providers = []
+    # CUDA graphs are captured by the CUDA provider, TensorRT must not take the graph
+    if 'TensorrtExecutionProvider' in available and not ENABLE_CUDA_GRAPH:
+        providers.append(('TensorrtExecutionProvider', {
+            'trt_engine_cache_enable': True,
+            'trt_engine_cache_path': TRT_CACHE_PATH,
+        }))
+    if 'CUDAExecutionProvider' in available:
+        if ENABLE_CUDA_GRAPH:
+            providers.append(('CUDAExecutionProvider', {
+                'device_id': 0,
+                'cudnn_conv_algo_search': 'DEFAULT',
+                'enable_cuda_graph': True,
+            }))
+        else:
+            providers.append('CUDAExecutionProvider')
+    providers.append('CPUExecutionProvider')
+    return providers
+
+def _create_session_options():
+    """
+    Create session options with the thread settings shared by all sessions.
+
+    Returns:
+        onnxruntime.SessionOptions: Options to create a session with
+    """
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = INTRA_OP_NUM_THREADS
+    # The graph is a single chain of operators, nothing to run in parallel
+    sess_options.inter_op_num_threads = 1
+    return sess_options
+
+def _preferred_provider(providers):
+    """
+    Get the name of the highest priority execution provider.
+
+    Args:
+        providers: Execution providers as returned by _get_providers()
+
+    Returns:
+        str: Provider name, e.g. 'CUDAExecutionProvider'
+    """
+    return providers[0] if isinstance(providers[0], str) else providers[0][0]
+
+def _select_model_path(providers):
+    """
+    Pick the model file for the execution providers.
+
+    GPUs run the half-precision model if one was exported, halving memory
+    traffic and using the tensor cores. Inputs and outputs stay float32, so
+    preprocessing is the same for both models.
+
+    Args:
+        providers: Execution providers the session will be created with
+
+    Returns:
+        str: Path of the model file
+    """
+    gpu_providers = ('CUDAExecutionProvider', 'TensorrtExecutionProvider')
+    if _preferred_provider(providers) in gpu_providers and os.path.exists(FP16_MODEL_PATH):
+        return FP16_MODEL_PATH
+    return MODEL_PATH
+
+def _capture_cuda_graph(state, batch_size):
+    """
+    Bind fixed device-side input/output tensors and capture the CUDA graph.
+
+    Args:
+        state: Per-thread inference state holding the session
+        batch_size: Batch size every run is padded to
+    """
+    state.input_buffer = np.zeros((batch_size, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+    state.cuda_graph_input = onnxruntime.OrtValue.ortvalue_from_numpy(state.input_buffer, 'cuda', 0)
+    state.cuda_graph_output = onnxruntime.OrtValue.ortvalue_from_shape_and_type(
+        [batch_size, NUM_OUTPUTS], np.float32, 'cuda', 0)
+
+    state.io_binding.bind_ortvalue_input(INPUT_NAME, state.cuda_graph_input)
+    state.io_binding.bind_ortvalue_output(OUTPUT_NAME, state.cuda_graph_output)
+
+    # The first run captures the graph, later runs replay it
+    state.session.run_with_iobinding(state.io_binding)
+    logger.info(f"Captured CUDA graph for batch size {batch_size}")
+
+def _init_thread_state(session):
+    """
+    Make `session` the inference session of the calling thread.
+
+    Args:
+        session: onnxruntime.InferenceSession of the model
+
+    Returns:
+        threading.local: Inference state of the calling thread
+    """
+    state = _thread_local
+    state.session = session
+    state.parent = SESSION
+    # Buffers are allocated on the first run
+    state.io_binding = session.io_binding()
+    state.input_buffer = state.output_buffer = state.bound_batch_size = None
+
+    if CUDA_GRAPH_BATCH_SIZE is not None:
+        _capture_cuda_graph(state, CUDA_GRAPH_BATCH_SIZE)
+    return state
+
+def _get_thread_state():
+    """
+    Get the inference state of the calling thread, creating its session on
+    first use.
+
+    Concurrent runs on a single session contend on ONNX Runtime's internal
+    locks, so every thread running inference gets a session of its own.
+
+    Returns:
+        threading.local: Inference state of the calling thread
+
+    Raises:
+        RuntimeError: If model is not initialized
+    """
+    if not is_model_loaded():
+        raise RuntimeError("Model not initialized. Call initialize_model() first.")
+
+    if TRITON_URL:
+        # The HTTP client is not thread-safe, every thread gets its own
+        if getattr(_thread_local, 'triton_client', None) is None:
+            _thread_local.triton_client = triton_http.InferenceServerClient(url=TRITON_URL)
+            _thread_local.input_buffer = None
+        return _thread_local
+
+    # Recreate the session if the model was reloaded since
+    if getattr(_thread_local, 'parent', None) is not SESSION:
+        sess_options = _create_session_options()
+        # The optimized copy of the model needs no further optimization
+        if _SESSION_PREOPTIMIZED:
+            sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        elif GRAPH_OPTIMIZATION_LEVEL == "basic":
+            sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        session = onnxruntime.InferenceSession(
+            _SESSION_MODEL_PATH, sess_options=sess_options, providers=_SESSION_PROVIDERS)
+        logger.info(f"Created inference session for thread {threading.current_thread().name}")
+        _init_thread_state(session)
+
+    return _thread_local
+
+def _prepare_optimized_model(sess_options, providers, model_path):
+    """
+    Pick the model file to load and configure graph optimization accordingly.
 
-def initialize_model():
+    If a graph-optimized copy of the model for the preferred provider exists
+    and is newer than the model itself, it is loaded with graph optimizations
+    disabled. Otherwise the model is optimized as usual and ONNX Runtime is
+    asked to save the result, so the next start can skip the optimization.
+
+    Args:
+        sess_options: onnxruntime.SessionOptions to configure
+        providers: Execution providers the session will be created with
+        model_path: Path of the model file
+
+    Returns:
+        tuple: (path of the model to load, path the optimized model should be
+               moved to once the session is created or None)
+    """
+    if GRAPH_OPTIMIZATION_LEVEL == "basic":
+        # Cheap enough to run on every start, nothing to cache
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        return model_path, None
+
+    sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    # TensorRT compiles the graph itself and keeps its own engine cache
+    preferred = _preferred_provider(providers)
+    if preferred == 'TensorrtExecutionProvider':
+        return model_path, None
+
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    provider = preferred.replace('ExecutionProvider', '').lower()
+    cache_path = OPTIMIZED_MODEL_PATH.format(model=model_name, provider=provider)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+        logger.info(f"Using pre-optimized model {cache_path}")
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return cache_path, None
+
+    if not os.access(os.path.dirname(cache_path), os.W_OK):
+        return model_path, None
+
+    # Write under a per-process name so concurrently starting workers never
+    # read a partially written file, the caller moves it into place
+    sess_options.optimized_model_filepath = f"{cache_path}.{os.getpid()}.tmp"
+    return model_path, cache_path
+
+def _set_input_normalization(model_normalizes):
+    """
+    Configure normalize_into() for the loaded model.
+
+    Args:
+        model_normalizes: Whether the model applies the ImageNet mean/std
+                          normalization to its input itself
+    """
+    global INPUT_SCALE, INPUT_BIAS
+    if model_normalizes:
+        INPUT_SCALE, INPUT_BIAS = UNIT_SCALE, ZERO_BIAS
+    else:
+        INPUT_SCALE, INPUT_BIAS = NORM_SCALE, NORM_BIAS
+
+def _initialize_triton(max_batch_size):
     """
-    Initialize ONNX Runtime session and load the deepfake detection model.
+    Connect to the Triton Inference Server and read the model's metadata.
+
+    Args:
+        max_batch_size: Largest batch passed to run_batch()
+
+    Raises:
+        RuntimeError: If tritonclient is not installed or the model is not ready
+    """
+    global TRITON_MODEL_READY, TRITON_MAX_BATCH_SIZE
+    global OUTPUT_IS_PROBABILITIES, INPUT_NAME, OUTPUT_NAME, FIXED_BATCH_SIZE, NUM_OUTPUTS
+
+    if triton_http is None:
+        raise RuntimeError("tritonclient[http] is required to run the model on Triton")
+
+    client = triton_http.InferenceServerClient(url=TRITON_URL)
+    if not client.is_model_ready(TRITON_MODEL_NAME):
+        raise RuntimeError(f"Model {TRITON_MODEL_NAME} is not ready on Triton server {TRITON_URL}")
+
+    metadata = client.get_model_metadata(TRITON_MODEL_NAME)
+    config = client.get_model_config(TRITON_MODEL_NAME)
+
+    INPUT_NAME = metadata['inputs'][0]['name']
+    OUTPUT_NAME = metadata['outputs'][0]['name']
+    # Triton batches dynamically, no padding needed
+    FIXED_BATCH_SIZE = None
+    NUM_OUTPUTS = int(metadata['outputs'][0]['shape'][-1])
+    parameters = config.get('parameters', {})
+    output_type = parameters.get('output_type', {}).get('string_value')
+    OUTPUT_IS_PROBABILITIES = output_type == "probabilities"
+    input_normalization = parameters.get('input_normalization', {}).get('string_value')
+    _set_input_normalization(input_normalization == "imagenet")
+    TRITON_MAX_BATCH_SIZE = config.get('max_batch_size') or max_batch_size
+    TRITON_MODEL_READY = True
+
+    logger.info(f"Using model {TRITON_MODEL_NAME} on Triton server {TRITON_URL}, "
+                f"max batch size: {TRITON_MAX_BATCH_SIZE}")
+
+def _infer_triton(state, batch_size):
+    """
+    Run the model on the Triton server on a thread's filled input buffer.
+
+    Args:
+        state: Per-thread inference state holding the client
+        batch_size: Number of images in the run
+
+    Returns:
+        np.ndarray: Raw model scores of shape (batch_size, num_outputs)
+    """
+    batch = state.input_buffer[:batch_size]
+    infer_input = triton_http.InferInput(INPUT_NAME, list(batch.shape), "FP32")
+    infer_input.set_data_from_numpy(batch, binary_data=True)
+    infer_output = triton_http.InferRequestedOutput(OUTPUT_NAME, binary_data=True)
+
+    result = state.triton_client.infer(TRITON_MODEL_NAME, [infer_input], outputs=[infer_output])
+    # The array is a read-only view of the response, postprocess() works in place
+    return result.as_numpy(OUTPUT_NAME).copy()
+
+def _initialize_e2e_session(providers):
+    """
+    Create the session of the model with embedded preprocessing.
+
+    Args:
+        providers: Execution providers the session will be created with
+
+    Raises:
+        FileNotFoundError: If the model file doesn't exist
+        RuntimeError: If onnxruntime-extensions is not installed
+    """
+    global E2E_SESSION, E2E_INPUT_NAME
+
+    if not os.path.exists(E2E_MODEL_PATH):
+        raise FileNotFoundError(f"Model file not found at {E2E_MODEL_PATH}")
+    if onnxruntime_extensions is None:
+        raise RuntimeError("onnxruntime-extensions is required for embedded preprocessing")
+
+    sess_options = _create_session_options()
+    sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Image decoding and resizing ops live in the extensions library
+    sess_options.register_custom_ops_library(onnxruntime_extensions.get_library_path())
+
+    E2E_SESSION = onnxruntime.InferenceSession(E2E_MODEL_PATH, sess_options=sess_options, providers=providers)
+    E2E_INPUT_NAME = E2E_SESSION.get_inputs()[0].name
+    logger.info(f"Loaded model with embedded preprocessing from {E2E_MODEL_PATH}")
+
+def initialize_model(max_batch_size=1):
+    """
+    Initialize ONNX Runtime session and load the deepfake detection model,
+    or connect to the Triton server serving it if TRITON_URL is set.
     This function should be called at application startup.
+
+    Args:
+        max_batch_size: Largest batch passed to run_batch(); with CUDA graphs
+                        enabled every run is padded to this size
     
     Returns:
         bool: True if model loaded successfully
@@ -27,33 +425,77 @@ def initialize_model():
         FileNotFoundError: If model file doesn't exist
         RuntimeError: If model loading fails
     """
-    global SESSION
+    global SESSION, _SESSION_MODEL_PATH, _SESSION_PROVIDERS, _SESSION_PREOPTIMIZED, CUDA_GRAPH_BATCH_SIZE
+    global OUTPUT_IS_PROBABILITIES, INPUT_NAME, OUTPUT_NAME, FIXED_BATCH_SIZE, NUM_OUTPUTS
     
     try:
+        if TRITON_URL:
+            _initialize_triton(max_batch_size)
+            return True
+
         # Check if model file exists
         if not os.path.exists(MODEL_PATH):
             raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
         
-        # Create inference session with optimizations
-        logger.info(f"Loading model from {MODEL_PATH}")
-        
         # Configure session options for better performance
-        sess_options = onnxruntime.SessionOptions()
-        # Enable all graph optimizations for best performance
-        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
-        # Set number of threads for CPU computation
-        sess_options.intra_op_num_threads = 4  # Adjust based on your hardware
+        sess_options = _create_session_options()
         
         # Try to use GPU if available, fallback to CPU
-        providers = ['CUDAExecutionProvider', 'CPUExecutionProvider'] if 'CUDAExecutionProvider' in onnxruntime.get_available_providers() else ['CPUExecutionProvider']
+        providers = _get_providers()
+
+        # Create inference session with optimizations
+        model_path = _select_model_path(providers)
+        logger.info(f"Loading model from {model_path}")
+
+        # Enable all graph optimizations, or reuse the result of a previous start
+        model_path, optimized_model_path = _prepare_optimized_model(sess_options, providers, model_path)
         
         # Create the inference session
-        SESSION = onnxruntime.InferenceSession(MODEL_PATH, sess_options=sess_options, providers=providers)
+        session = onnxruntime.InferenceSession(model_path, sess_options=sess_options, providers=providers)
+
+        if optimized_model_path and os.path.exists(sess_options.optimized_model_filepath):
+            os.replace(sess_options.optimized_model_filepath, optimized_model_path)
+            logger.info(f"Saved optimized model to {optimized_model_path}")
+            model_path = optimized_model_path
+
+        # Sessions of other threads load the same (optimized) model file
+        _SESSION_MODEL_PATH = model_path
+        _SESSION_PREOPTIMIZED = model_path.endswith(".optimized.onnx")
+        _SESSION_PROVIDERS = providers
+
+        metadata = session.get_modelmeta().custom_metadata_map
+        OUTPUT_IS_PROBABILITIES = metadata.get("output_type") == "probabilities"
+        _set_input_normalization(metadata.get("input_normalization") == "imagenet")
+
+        input_meta = session.get_inputs()[0]
+        output_meta = session.get_outputs()[0]
+        INPUT_NAME = input_meta.name
+        OUTPUT_NAME = output_meta.name
+        # Dynamic dimensions are reported as names
+        batch_dim = input_meta.shape[0]
+        FIXED_BATCH_SIZE = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+        NUM_OUTPUTS = output_meta.shape[1] if isinstance(output_meta.shape[1], int) else len(LABELS)
+
+        CUDA_GRAPH_BATCH_SIZE = None
+        if ENABLE_CUDA_GRAPH and 'CUDAExecutionProvider' in session.get_providers():
+            CUDA_GRAPH_BATCH_SIZE = FIXED_BATCH_SIZE or max_batch_size
+
+        # The session also serves inference from the calling thread
+        SESSION = session
+        _init_thread_state(session)
+
+        if ENABLE_EMBEDDED_PREPROCESSING:
+            _initialize_e2e_session(providers)
+
+        # Trigger JIT compilation of the preprocessing kernel before the first request
+        normalize_into(
+            np.zeros((INPUT_SIZE[1], INPUT_SIZE[0], 3), dtype=np.uint8),
+            np.empty((3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+        )
         
         # Validate model input/output
-        input_name = SESSION.get_inputs()[0].name
-        input_shape = SESSION.get_inputs()[0].shape
-        logger.info(f"Model input name: {input_name}, shape: {input_shape}")
+        logger.info(f"Model input name: {INPUT_NAME}, shape: {input_meta.shape}")
+        logger.info(f"Model outputs {'probabilities' if OUTPUT_IS_PROBABILITIES else 'logits'}")
         logger.info(f"Model loaded successfully using providers: {SESSION.get_providers()}")
         
         return True
@@ -68,9 +510,74 @@ def is_model_loaded():
     Returns:
         bool: True if model is loaded, False otherwise
     """
-    return SESSION is not None
+    return SESSION is not None or TRITON_MODEL_READY
+
+if numba is not None:
+    # Serial on purpose: images are preprocessed concurrently by the
+    # inference threads, which each own their share of the cores. A
+    # parallel=True kernel would oversubscribe them, and Numba's default
+    # workqueue threading layer aborts when called from several threads
+    @numba.njit(fastmath=True, cache=True)
+    def _normalize_kernel(src, dst, scale, bias):
+        """Fused cast, scale, normalize and HWC to CHW transpose in one pass."""
+        height, width, channels = src.shape
+        for c in range(channels):
+            for y in range(height):
+                for x in range(width):
+                    dst[c, y, x] = src[y, x, c] * scale[c] + bias[c]
 
-def preprocess_image(image):
+def normalize_into(img_array, out):
+    """
+    Normalize an HWC uint8 image and write it into a CHW float32 buffer.
+
+    Scaling to [0,1], ImageNet mean/std normalization (unless the model does
+    it itself) and the HWC to CHW transpose are fused into a single pass over
+    the image. Uses a Numba JIT kernel when numba is installed, NumPy otherwise.
+
+    Args:
+        img_array: np.ndarray of shape (H, W, 3) in uint8
+        out: np.ndarray of shape (3, H, W) in float32, written in place
+
+    Returns:
+        np.ndarray: `out`
+    """
+    if numba is not None:
+        _normalize_kernel(img_array, out, INPUT_SCALE.ravel(), INPUT_BIAS.ravel())
+        return out
+
+    np.multiply(img_array.transpose(2, 0, 1), INPUT_SCALE, out=out)
+    if INPUT_BIAS is not ZERO_BIAS:
+        out += INPUT_BIAS
+    return out
+
+def decode_image(contents):
+    """
+    Decode an uploaded image file.
+
+    JPEG files are decoded straight to an RGB array with libjpeg-turbo when
+    PyTurboJPEG is available, other formats are decoded with PIL.
+
+    Args:
+        contents: Raw bytes of a jpg/png/webp image
+
+    Returns:
+        np.ndarray or PIL.Image: RGB image, HWC uint8 array or PIL Image
+
+    Raises:
+        Exception: If the file is not a valid image
+    """
+    # JPEG files start with the SOI marker
+    if _turbo_jpeg is not None and contents[:2] == b'\xff\xd8':
+        return _turbo_jpeg.decode(contents, pixel_format=TJPF_RGB)
+    image = Image.open(BytesIO(contents))
+    # convert() copies the image even if it is RGB already
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    # Decode now, so invalid files are reported by the caller
+    image.load()
+    return image
+
+def preprocess_image(image, out=None):
     """
     Optimized image preprocessing function for the deepfake detection model.
     
@@ -81,35 +588,37 @@ def preprocess_image(image):
     4. Converts from HWC to NCHW format
     
     Args:
-        image: PIL Image object
+        image: PIL Image object, or RGB np.ndarray in HWC uint8 format
+        out: Optional preallocated np.ndarray of shape (1, 3, 224, 224) in
+             float32 to write the result into
         
     Returns:
         np.ndarray: Preprocessed image as numpy array in NCHW format
     """
-    # Ensure the image is in RGB format
-    if image.mode != "RGB":
-        image = image.convert("RGB")
+    if isinstance(image, np.ndarray):
+        img_array = image
+    else:
+        # Ensure the image is in RGB format
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        img_array = np.asarray(image)
 
-    # Resize to exact 224x224 (fast but may distort image)
-    if image.size != INPUT_SIZE:
-        image = image.resize(INPUT_SIZE, Image.BILINEAR)
-    
-    # Convert to numpy array with float32 precision
-    img_array = np.array(image, dtype=np.float32)
-    
-    # Normalize to [0,1]
-    img_array /= 255.0
-    
-    # Apply ImageNet normalization using pre-computed values
-    img_array = (img_array - IMAGENET_MEAN) / IMAGENET_STD
-    
-    # Rearrange dimensions from HWC to NCHW format (batch, channels, height, width)
-    img_array = img_array.transpose(2, 0, 1)
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
-    logger.debug(f"Preprocessed image shape: {img_array.shape}")
+    # Resize to exact 224x224 (fast but may distort image) with OpenCV's SIMD kernels.
+    # INTER_AREA avoids aliasing when shrinking, like PIL's resize does.
+    height, width = img_array.shape[:2]
+    if (width, height) != INPUT_SIZE:
+        shrinking = width > INPUT_SIZE[0] or height > INPUT_SIZE[1]
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+        img_array = cv2.resize(img_array, INPUT_SIZE, interpolation=interpolation)
+
+    if out is None:
+        out = np.empty((1, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+
+    # Scale, normalize and rearrange to NCHW in a single pass
+    normalize_into(img_array, out[0])
+    logger.debug(f"Preprocessed image shape: {out.shape}")
     
-    return img_array.astype(np.float32)  # Ensure float32 type for inference
+    return out
 
 def preprocess_image_advanced(image):
     """
@@ -140,16 +649,198 @@ def preprocess_image_advanced(image):
     paste_y = (INPUT_SIZE[1] - new_height) // 2
     new_image.paste(image, (paste_x, paste_y))
     
-    # Convert to numpy and normalize
-    img_array = np.array(new_image, dtype=np.float32)
-    img_array /= 255.0
-    img_array = (img_array - IMAGENET_MEAN) / IMAGENET_STD
+    # Normalize and rearrange to NCHW format
+    img_array = np.empty((1, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+    normalize_into(np.asarray(new_image), img_array[0])
     
-    # Rearrange to NCHW format
-    img_array = img_array.transpose(2, 0, 1)
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    return img_array.astype(np.float32)
+    return img_array
+
+def get_max_batch_size(default):
+    """
+    Get the largest batch the loaded model accepts in a single run.
+
+    Models exported with dynamic axes accept any batch size, in which case
+    `default` is returned. Models exported with a fixed batch dimension are
+    limited to that size.
+
+    Args:
+        default: Batch size to use when the batch dimension is dynamic
+
+    Returns:
+        int: Maximum number of images per inference run
+    """
+    if not is_model_loaded():
+        raise RuntimeError("Model not initialized. Call initialize_model() first.")
+
+    if TRITON_MAX_BATCH_SIZE is not None:
+        return min(default, TRITON_MAX_BATCH_SIZE)
+
+    if CUDA_GRAPH_BATCH_SIZE is not None:
+        return min(default, CUDA_GRAPH_BATCH_SIZE)
+
+    if FIXED_BATCH_SIZE is not None:
+        return min(default, FIXED_BATCH_SIZE)
+    return default
+
+def _bind_buffers(state, batch_size):
+    """
+    Bind the input/output buffers of a thread's session for the given batch size.
+
+    The buffers are only reallocated when a larger batch than any before
+    arrives; smaller batches bind a leading slice of them.
+
+    Args:
+        state: Per-thread inference state
+        batch_size: Number of images in the next run
+
+    Returns:
+        tuple: (input buffer, output buffer) views of shape
+               (batch_size, 3, H, W) and (batch_size, num_outputs)
+    """
+    if state.input_buffer is None or len(state.input_buffer) < batch_size:
+        state.input_buffer = np.empty((batch_size, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+        state.output_buffer = np.empty((batch_size, NUM_OUTPUTS), dtype=np.float32)
+        state.bound_batch_size = None
+
+    input_buffer = state.input_buffer[:batch_size]
+    output_buffer = state.output_buffer[:batch_size]
+
+    if state.bound_batch_size != batch_size:
+        state.io_binding.bind_input(INPUT_NAME, 'cpu', 0, np.float32,
+                                    list(input_buffer.shape), input_buffer.ctypes.data)
+        state.io_binding.bind_output(OUTPUT_NAME, 'cpu', 0, np.float32,
+                                     list(output_buffer.shape), output_buffer.ctypes.data)
+        state.bound_batch_size = batch_size
+
+    return input_buffer, output_buffer
+
+def _prepare_input(state, batch_size):
+    """
+    Get the input buffer of the next run of a thread's session.
+
+    Rows past `batch_size` are padding for models that need a fixed batch
+    size and are zeroed.
+
+    Args:
+        state: Per-thread inference state
+        batch_size: Number of images in the next run
+
+    Returns:
+        np.ndarray: Input buffer whose first `batch_size` rows are to be filled
+    """
+    if TRITON_URL:
+        # Only the filled rows are sent to the server
+        if state.input_buffer is None or len(state.input_buffer) < batch_size:
+            state.input_buffer = np.empty((batch_size, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+        return state.input_buffer
+
+    if CUDA_GRAPH_BATCH_SIZE is not None:
+        input_buffer = state.input_buffer
+    else:
+        # Models with a fixed batch dimension need the batch padded to that size
+        run_size = FIXED_BATCH_SIZE or batch_size
+        input_buffer, _ = _bind_buffers(state, run_size)
+
+    input_buffer[batch_size:] = 0
+    return input_buffer
+
+def _run(state, batch_size):
+    """
+    Run a thread's session on its filled input buffer.
+
+    Args:
+        state: Per-thread inference state
+        batch_size: Number of images in the run
+
+    Returns:
+        np.ndarray: Raw model scores of shape (batch_size, num_outputs)
+    """
+    if TRITON_URL:
+        return _infer_triton(state, batch_size)
+
+    if CUDA_GRAPH_BATCH_SIZE is not None:
+        # Replay the captured graph on the padded batch
+        state.cuda_graph_input.update_inplace(state.input_buffer)
+        state.session.run_with_iobinding(state.io_binding)
+        return state.cuda_graph_output.numpy()[:batch_size]
+
+    state.session.run_with_iobinding(state.io_binding)
+    # Copy the scores out, the output buffer is overwritten by the next run
+    return state.output_buffer[:batch_size].copy()
+
+def run_batch(batch):
+    """
+    Run the ONNX model on a batch of preprocessed images, using the session
+    of the calling thread.
+
+    Args:
+        batch: np.ndarray of shape (N, 3, H, W) in float32
+
+    Returns:
+        np.ndarray: Raw model scores of shape (N, num_outputs)
+
+    Raises:
+        RuntimeError: If model is not initialized
+    """
+    state = _get_thread_state()
+    input_buffer = _prepare_input(state, len(batch))
+    input_buffer[:len(batch)] = batch
+    return _run(state, len(batch))
+
+def run_images(images):
+    """
+    Preprocess a batch of images and run the ONNX model on them, using the
+    session of the calling thread.
+
+    Each image is preprocessed straight into its row of the session's input
+    buffer, so no per-image float array is allocated and no batch is
+    assembled by copying.
+
+    Args:
+        images: List of images, see preprocess_image()
+
+    Returns:
+        np.ndarray: Raw model scores of shape (N, num_outputs)
+
+    Raises:
+        RuntimeError: If model is not initialized
+    """
+    state = _get_thread_state()
+    input_buffer = _prepare_input(state, len(images))
+    for i, image in enumerate(images):
+        preprocess_image(image, out=input_buffer[i:i + 1])
+    return _run(state, len(images))
+
+def postprocess(scores):
+    """
+    Convert the raw model scores of a single image into prediction results.
+
+    Args:
+        scores: np.ndarray of shape (num_outputs,), overwritten with the
+                probabilities
+
+    Returns:
+        list: List of dictionaries containing label and confidence score,
+              sorted by confidence score (highest first)
+    """
+    # Process output based on model type
+    if not OUTPUT_IS_PROBABILITIES and len(scores) == len(LABELS):
+        # Apply softmax in place to convert logits to probabilities
+        # Subtract max for numerical stability
+        np.subtract(scores, scores.max(), out=scores)
+        np.exp(scores, out=scores)
+        scores /= scores.sum()
+    # Otherwise the model already outputs probabilities
+
+    # Build result structure, converting to Python float for JSON serialization
+    results = [{"label": label, "score": float(score)} for label, score in zip(LABELS, scores)]
+
+    # Sort results by confidence score (highest first)
+    results = sorted(results, key=lambda x: x["score"], reverse=True)
+
+    logger.debug(f"Prediction results: {results}")
+
+    return results
 
 def predict(image):
     """
@@ -172,45 +863,45 @@ def predict(image):
         RuntimeError: If model is not initialized
         Exception: If prediction process fails
     """
-    if SESSION is None:
+    if not is_model_loaded():
         raise RuntimeError("Model not initialized. Call initialize_model() first.")
     
     try:
-        # Use optimized preprocessing
-        input_data = preprocess_image(image)
-        
-        # Get model input and output names
-        input_name = SESSION.get_inputs()[0].name
-        output_name = SESSION.get_outputs()[0].name
-        
-        # Run inference
-        outputs = SESSION.run([output_name], {input_name: input_data})
-        scores = outputs[0][0]  # Extract scores
-        # Process output based on model type
-        if len(scores) == len(LABELS):
-            # Apply softmax to convert logits to probabilities
-            # Subtract max for numerical stability
-            exp_scores = np.exp(scores - np.max(scores))
-            probs = exp_scores / exp_scores.sum()
-        else:
-            # Assume model already outputs probabilities
-            probs = scores
-            
-        # Build result structure
-        results = []
-        for i, label in enumerate(LABELS):
-            results.append({
-                "label": label,
-                "score": float(probs[i])  # Convert to Python float for JSON serialization
-            })
+        # Preprocess into the input buffer, run inference and extract
+        # scores of the single image
+        scores = run_images([image])[0]
         
-        # Sort results by confidence score (highest first)
-        results = sorted(results, key=lambda x: x["score"], reverse=True)
-        
-        logger.debug(f"Prediction results: {results}")
-        
-        return results
+        return postprocess(scores)
     
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        raise
+
+def predict_bytes(contents):
+    """
+    Perform deepfake detection on an encoded image using the model with
+    embedded preprocessing.
+
+    Args:
+        contents: Raw bytes of a jpg/png/webp image
+
+    Returns:
+        list: List of dictionaries containing label and confidence score,
+              see predict()
+
+    Raises:
+        RuntimeError: If the model with embedded preprocessing is not initialized
+        Exception: If prediction process fails
+    """
+    if E2E_SESSION is None:
+        raise RuntimeError("Model with embedded preprocessing not initialized.")
+
+    try:
+        image_bytes = np.frombuffer(contents, dtype=np.uint8)
+        scores = E2E_SESSION.run(None, {E2E_INPUT_NAME: image_bytes})[0][0]
+
+        return postprocess(scores)
+
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise
\ No newline at end of file
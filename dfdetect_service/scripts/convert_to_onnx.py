@@ -1,4 +1,5 @@
 import argparse
+import collections
 import os
 import torch
 import torch.nn as nn
@@ -39,7 +40,15 @@ def load_pytorch_model(model_path, device='cuda'):
     logger.info("Created modified ResNet18 model with sequential FC layer")
 
     # Load checkpoint
-    checkpoint = torch.load(model_path, map_location=device,weights_only=True)
+    try:
+        # Page the tensors in from the file instead of staging the whole
+        # checkpoint in host memory first
+        checkpoint = torch.load(model_path, map_location=device, weights_only=True, mmap=True)
+        logger.info("Checkpoint memory-mapped")
+    except (TypeError, RuntimeError) as e:
+        # PyTorch < 2.1 has no mmap argument, legacy (non-zip) checkpoints can't be mapped
+        logger.warning(f"Couldn't memory-map checkpoint: {e}")
+        checkpoint = torch.load(model_path, map_location=device, weights_only=True)
     logger.info(f"Checkpoint loaded from {model_path}")
     logger.info(f"Checkpoint type: {type(checkpoint)}")
     
@@ -78,6 +87,11 @@ def load_pytorch_model(model_path, device='cuda'):
             logger.error(f"Loading failed: {e}")
             raise
 
+    # Dropout is an identity at inference, keep only the Linear layer so no
+    # Dropout node ends up in the exported graph. The state dict uses the
+    # fc.1.* keys, so this has to happen after loading it
+    model.fc = model.fc[1]
+
     # Move model to the specified device
     model.to(device)
     model.eval()  # Set to evaluation mode
@@ -86,8 +100,97 @@ def load_pytorch_model(model_path, device='cuda'):
     return model
 
 
+class SoftmaxModel(nn.Module):
+    """
+    Wrap a classifier so it outputs class probabilities instead of logits.
+
+    Exporting the softmax with the model saves the service from computing
+    it in Python for every request.
+    """
+
+    def __init__(self, base_model):
+        super().__init__()
+        self.base_model = base_model
+
+    def forward(self, x):
+        return torch.softmax(self.base_model(x), dim=1)
+
+
+class ImageNetNormalizedModel(nn.Module):
+    """
+    Wrap a classifier so it applies the ImageNet mean/std normalization to
+    its input itself.
+
+    The model then takes RGB images scaled to [0,1], and ONNX Runtime folds
+    the normalization into the first convolution.
+    """
+
+    def __init__(self, base_model):
+        super().__init__()
+        self.base_model = base_model
+        self.register_buffer('mean', torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1))
+
+    def forward(self, x):
+        return self.base_model((x - self.mean) / self.std)
+
+
+class ImageCalibrationDataReader:
+    """
+    Feed preprocessed images to static quantization, implementing the
+    onnxruntime.quantization.CalibrationDataReader interface.
+
+    The images are preprocessed the same way as by the service, so the
+    activation ranges are calibrated on the inputs the model will see.
+    """
+
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+    def __init__(self, image_dir, input_name='input', input_size=224, max_images=100, normalize=True):
+        """
+        Args:
+            image_dir: Directory with representative images
+            input_name: Name of the model input
+            input_size: Input image size of the model
+            max_images: Maximum number of images to calibrate on
+            normalize: Whether to apply the ImageNet normalization, False for
+                       models that normalize their input themselves
+        """
+        self.image_paths = sorted(
+            os.path.join(image_dir, name) for name in os.listdir(image_dir)
+            if name.lower().endswith(self.IMAGE_EXTENSIONS)
+        )[:max_images]
+        if not self.image_paths:
+            raise ValueError(f"No calibration images found in {image_dir}")
+
+        self.input_name = input_name
+        steps = [
+            transforms.Resize((input_size, input_size)),
+            transforms.ToTensor(),
+        ]
+        if normalize:
+            steps.append(transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]))
+        self.transform = transforms.Compose(steps)
+        self.rewind()
+
+    def get_next(self):
+        """Return the next input feed, or None when all images were read."""
+        image_path = next(self._iterator, None)
+        if image_path is None:
+            return None
+        from PIL import Image
+        image = Image.open(image_path).convert('RGB')
+        return {self.input_name: self.transform(image).unsqueeze(0).numpy()}
+
+    def rewind(self):
+        """Start over from the first image."""
+        self._iterator = iter(self.image_paths)
+
+
 def convert_to_onnx(model, output_path, input_shape=(1, 3, 224, 224),
-                    dynamic_axes=False, optimize=True, quantize=True):
+                    dynamic_axes=True, optimize=True, quantize=True, calibration_dir=None,
+                    fp16=False, include_softmax=True, include_normalization=True,
+                    quant_type='qint8'):
     """
     Convert PyTorch model to ONNX format.
 
@@ -95,15 +198,30 @@ def convert_to_onnx(model, output_path, input_shape=(1, 3, 224, 224),
         model: PyTorch model
         output_path: Path to save the ONNX model
         input_shape: Input shape for the model (batch_size, channels, height, width)
-        dynamic_axes: Whether to use dynamic axes (for variable batch size)
+        dynamic_axes: Whether to use dynamic axes (for variable batch size,
+                      required by the service's request batching)
         optimize: Whether to optimize the ONNX model
         quantize: Whether to quantize the ONNX model
+        calibration_dir: Directory with representative images. If given, weights
+                         and activations are statically quantized to int8,
+                         otherwise only weights are quantized dynamically
+        fp16: Whether to also save a half-precision model for GPU inference
+              (<output>_fp16.onnx)
+        include_softmax: Whether the ONNX model outputs probabilities instead of logits
+        include_normalization: Whether the ONNX model applies the ImageNet
+                               normalization to its [0,1] scaled input itself
+        quant_type: Weight type of dynamic quantization, 'qint8' (signed, runs
+                    on the VNNI int8 kernels) or 'quint8'
     """
     logger.info(f"Converting model to ONNX format...")
 
-    # Create dummy input tensor
-    dummy_input = torch.randn(input_shape, requires_grad=True)
-    dummy_input = dummy_input.to(next(model.parameters()).device)
+    if include_normalization:
+        model = ImageNetNormalizedModel(model).eval()
+    if include_softmax:
+        model = SoftmaxModel(model).eval()
+
+    # Create dummy input tensor directly on the model's device
+    dummy_input = torch.randn(input_shape, device=next(model.parameters()).device)
 
     # Define dynamic axes if requested
     dynamic_axes_params = None
@@ -113,25 +231,53 @@ def convert_to_onnx(model, output_path, input_shape=(1, 3, 224, 224),
 
     # Export the model to ONNX format
     unoptimized_path = output_path.replace('.onnx', '_unoptimized.onnx')
-    torch.onnx.export(
-        model,                      # PyTorch model
-        dummy_input,                # Input tensor
-        unoptimized_path,           # Output file path
-        export_params=True,         # Store model weights in the model file
-        opset_version=17,           # Updated ONNX opset version for PyTorch 2.5+
-        do_constant_folding=True,   # Optimize constants
-        input_names=['input'],      # Input tensor name
-        output_names=['output'],    # Output tensor name
-        dynamic_axes=dynamic_axes_params,  # Dynamic axes if specified
-    )
+    # No autograd graph is needed to trace the model
+    with torch.no_grad():
+        torch.onnx.export(
+            model,                      # PyTorch model
+            dummy_input,                # Input tensor
+            unoptimized_path,           # Output file path
+            export_params=True,         # Store model weights in the model file
+            opset_version=17,           # Updated ONNX opset version for PyTorch 2.5+
+            do_constant_folding=True,   # Optimize constants
+            input_names=['input'],      # Input tensor name
+            output_names=['output'],    # Output tensor name
+            dynamic_axes=dynamic_axes_params,  # Dynamic axes if specified
+        )
 
     logger.info(f"ONNX model exported to {unoptimized_path}")
 
+    # Tell the service what the model outputs, the metadata is kept by the
+    # quantization/FP16 conversions below
+    try:
+        import onnx
+        onnx_model = onnx.load(unoptimized_path)
+        onnx.helper.set_model_props(onnx_model, {
+            'output_type': 'probabilities' if include_softmax else 'logits',
+            'input_normalization': 'imagenet' if include_normalization else 'none',
+        })
+        onnx.save(onnx_model, unoptimized_path)
+    except ImportError:
+        logger.warning("onnx not installed, model output type not recorded")
+
+    if optimize:
+        simplify_onnx_model(unoptimized_path)
+
+    if fp16:
+        convert_to_fp16(unoptimized_path, output_path.replace('.onnx', '_fp16.onnx'))
+
+    if not optimize and not quantize:
+        os.rename(unoptimized_path, output_path)
+        logger.info(f"Saved unoptimized model to {output_path}")
+
     # Optimize the model if requested
     if optimize or quantize:
         try:
             import onnx
-            from onnxruntime.quantization import quantize_dynamic, QuantType
+            import onnxruntime as ort
+            from onnxruntime.quantization import (
+                CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static)
+            from onnxruntime.quantization.shape_inference import quant_pre_process
 
             # Load the ONNX model
             onnx_model = onnx.load(unoptimized_path)
@@ -146,14 +292,62 @@ def convert_to_onnx(model, output_path, input_shape=(1, 3, 224, 224),
                 logger.info(f"Optimized ONNX model saved to {optimized_path}")
 
             if quantize:
+                # Fold and fuse the graph (e.g. BatchNorm into Conv) before quantizing,
+                # so no QuantizeLinear/DequantizeLinear pairs end up around BatchNorm
+                preoptimized_path = output_path.replace('.onnx', '_preopt.onnx')
+                preoptimize_onnx_model(unoptimized_path, preoptimized_path)
+                preprocessed_path = output_path.replace('.onnx', '_preprocessed.onnx')
+                quant_pre_process(preoptimized_path, preprocessed_path, skip_optimization=True)
+                os.remove(preoptimized_path)
+
                 # Quantize the model
                 quantized_path = output_path
-                quantize_dynamic(
-                    model_input=unoptimized_path,
-                    model_output=quantized_path,
-                    weight_type=QuantType.QUInt8,
-                    optimize_model=True
-                )
+                if calibration_dir:
+                    # Int8 weights and activations, run by the int8 (VNNI) kernels.
+                    # ORT fuses the QDQ pairs around each Conv into QLinearConv,
+                    # entropy calibration keeps outliers from widening the ranges
+                    logger.info(f"Calibrating static quantization on images in {calibration_dir}")
+                    quantize_static(
+                        model_input=preprocessed_path,
+                        model_output=quantized_path,
+                        calibration_data_reader=ImageCalibrationDataReader(
+                            calibration_dir, input_size=input_shape[2],
+                            normalize=not include_normalization),
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=True,
+                        calibrate_method=CalibrationMethod.Entropy
+                    )
+                else:
+                    logger.warning("No calibration images given, quantizing weights only")
+                    weight_type = QuantType.QInt8 if quant_type == 'qint8' else QuantType.QUInt8
+                    for per_channel in (True, False):
+                        quantize_dynamic(
+                            model_input=preprocessed_path,
+                            model_output=quantized_path,
+                            weight_type=weight_type,
+                            per_channel=per_channel,
+                            reduce_range=False,
+                            use_external_data_format=False,
+                            # Symmetric weight ranges match the s8 x u8 VNNI kernels
+                            extra_options={'WeightSymmetric': True}
+                        )
+                        # Some ORT versions can't load per-channel scales of 3D weights
+                        try:
+                            ort.InferenceSession(quantized_path, providers=['CPUExecutionProvider'])
+                            break
+                        except Exception as e:
+                            if not per_channel:
+                                raise
+                            logger.warning(f"Per-channel quantized model failed to load: {str(e)}")
+                    logger.info(f"Quantized weights {'per channel' if per_channel else 'per tensor'}")
+
+                # Static shapes let ORT pick the int8 kernels up front
+                onnx.shape_inference.infer_shapes_path(quantized_path, quantized_path)
+                logger.info(f"Ops before quantization: {dict(count_onnx_ops(preprocessed_path))}")
+                logger.info(f"Ops after quantization: {dict(count_onnx_ops(quantized_path))}")
+                os.remove(preprocessed_path)
                 logger.info(f"Quantized ONNX model saved to {quantized_path}")
 
         except ImportError as e:
@@ -172,13 +366,202 @@ def convert_to_onnx(model, output_path, input_shape=(1, 3, 224, 224),
                 logger.info(f"Saved unoptimized model to {output_path} due to optimization error")
 
 
-def verify_onnx_model(onnx_path, input_shape=(1, 3, 224, 224)):
+def preoptimize_onnx_model(onnx_path, output_path):
+    """
+    Apply the ONNX Runtime graph optimizations that are safe to quantize.
+
+    Constant folding and the Conv+BatchNorm / Conv+Add fusions of the basic
+    level are done. The extended level is not used: it fuses Conv+Relu into
+    the FusedConv contrib op, which the quantizer leaves in float.
+
+    Args:
+        onnx_path: Path to the ONNX model
+        output_path: Path to save the optimized model
+    """
+    import onnxruntime as ort
+
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    sess_options.optimized_model_filepath = output_path
+    # Creating the session writes the optimized model
+    ort.InferenceSession(onnx_path, sess_options, providers=['CPUExecutionProvider'])
+    logger.info(f"Pre-optimized ONNX model saved to {output_path}")
+
+
+def count_onnx_ops(onnx_path):
+    """
+    Count the nodes of an ONNX model by op type.
+
+    Args:
+        onnx_path: Path to the ONNX model
+
+    Returns:
+        collections.Counter mapping op type to number of nodes
+    """
+    import onnx
+
+    return collections.Counter(node.op_type for node in onnx.load(onnx_path).graph.node)
+
+
+def simplify_onnx_model(onnx_path):
+    """
+    Simplify an ONNX model in place with onnx-simplifier.
+
+    Constant folding and shape inference are done once here instead of by
+    ONNX Runtime on every start of the service. The input shapes are left
+    as exported, so a dynamic batch axis stays dynamic.
+
+    Args:
+        onnx_path: Path to the ONNX model
+    """
+    try:
+        import onnx
+        from onnxsim import simplify
+    except ImportError as e:
+        logger.warning(f"Couldn't simplify model: {str(e)}")
+        logger.warning("Install onnxsim to simplify the model")
+        return
+
+    onnx_model = onnx.load(onnx_path)
+    simplified_model, check = simplify(onnx_model)
+    if not check:
+        logger.warning("Simplified model failed validation, keeping the exported model")
+        return
+
+    onnx.save(simplified_model, onnx_path)
+    logger.info("ONNX model simplified")
+
+
+def convert_to_fp16(onnx_path, output_path):
+    """
+    Convert an ONNX model to half precision for GPU inference.
+
+    Inputs and outputs are kept float32, so the model is a drop-in
+    replacement for the float32 model.
+
+    Args:
+        onnx_path: Path to the float32 ONNX model
+        output_path: Path to save the half-precision model
+    """
+    try:
+        import onnx
+        from onnxconverter_common import float16
+    except ImportError as e:
+        logger.warning(f"Couldn't convert model to FP16: {str(e)}")
+        logger.warning("Install onnxconverter-common for FP16 conversion")
+        return
+
+    onnx_model = onnx.load(onnx_path)
+    fp16_model = float16.convert_float_to_float16(onnx_model, keep_io_types=True)
+    onnx.save(fp16_model, output_path)
+    logger.info(f"FP16 ONNX model saved to {output_path}")
+
+
+def add_preprocessing(onnx_path, output_path, input_size=224):
+    """
+    Create a model that takes the raw bytes of an encoded image as input.
+
+    Image decoding, resizing, scaling and ImageNet normalization are
+    prepended to the model as onnxruntime-extensions ops, so the service can
+    hand the uploaded file straight to ONNX Runtime without preprocessing it
+    in Python. The resulting model processes one image per run. Unlike the
+    service's stretch resize, the image is resized keeping its aspect ratio
+    and center cropped, as stretching is not supported by the Resize step.
+
+    Args:
+        onnx_path: Path to the ONNX model taking NCHW float input
+        output_path: Path to save the model with embedded preprocessing
+        input_size: Input image size of the model
+    """
+    try:
+        import onnx
+        from onnxruntime_extensions.tools.pre_post_processing import (
+            PrePostProcessor, create_named_value, ConvertImageToBGR, ReverseAxis,
+            Resize, CenterCrop, ChannelsLastToChannelsFirst, ImageBytesToFloat, Normalize, Unsqueeze
+        )
+    except ImportError as e:
+        logger.warning(f"Couldn't add preprocessing to model: {str(e)}")
+        logger.warning("Install onnxruntime-extensions to embed preprocessing")
+        return
+
+    onnx_model = onnx.load(onnx_path)
+    onnx_opset = next(opset.version for opset in onnx_model.opset_import if opset.domain in ('', 'ai.onnx'))
+
+    inputs = [create_named_value('image', onnx.TensorProto.UINT8, ['num_bytes'])]
+    steps = [
+        ConvertImageToBGR(),  # Decode jpg/png/webp to BGR in HWC layout
+        ReverseAxis(axis=2, dim_value=3, name="BGR_to_RGB"),
+        Resize(input_size),  # Shorter side to input_size, keeping aspect ratio
+        CenterCrop(input_size, input_size),
+        ChannelsLastToChannelsFirst(),  # HWC to CHW
+        ImageBytesToFloat(),  # Scale to [0,1]
+    ]
+    metadata = {prop.key: prop.value for prop in onnx_model.metadata_props}
+    if metadata.get('input_normalization') != 'imagenet':
+        steps.append(Normalize([(0.485, 0.229), (0.456, 0.224), (0.406, 0.225)]))  # ImageNet mean and std
+    steps.append(Unsqueeze([0]))  # Add batch dimension
+
+    pipeline = PrePostProcessor(inputs, onnx_opset)
+    pipeline.add_pre_processing(steps)
+
+    e2e_model = pipeline.run(onnx_model)
+    onnx.helper.set_model_props(e2e_model, metadata)
+    onnx.save(e2e_model, output_path)
+    logger.info(f"ONNX model with embedded preprocessing saved to {output_path}")
+
+
+# ONNX Runtime sessions of verified models, by model path
+_verify_sessions = {}
+
+
+def get_verify_session(onnx_path, verbose=False):
+    """
+    Get the ONNX Runtime session for verifying a model, creating it once.
+
+    Args:
+        onnx_path: Path to the ONNX model
+        verbose: Whether ONNX Runtime logs info messages, e.g. about nodes not
+                 assigned to the CUDA provider
+
+    Returns:
+        onnxruntime.InferenceSession of the model
+    """
+    if onnx_path not in _verify_sessions:
+        import onnxruntime
+
+        sess_options = onnxruntime.SessionOptions()
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        sess_options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+        if verbose:
+            sess_options.log_severity_level = 1
+
+        providers = [('CPUExecutionProvider', {})]
+        if 'CUDAExecutionProvider' in onnxruntime.get_available_providers():
+            # Explicit options keep the whole graph on the GPU
+            providers.insert(0, ('CUDAExecutionProvider', {
+                'device_id': 0,
+                'arena_extend_strategy': 'kNextPowerOfTwo',
+                'cudnn_conv_algo_search': 'EXHAUSTIVE',
+                'do_copy_in_default_stream': True,
+            }))
+
+        _verify_sessions[onnx_path] = onnxruntime.InferenceSession(
+            onnx_path,
+            sess_options=sess_options,
+            providers=providers
+        )
+    return _verify_sessions[onnx_path]
+
+
+def verify_onnx_model(onnx_path, input_shape=(1, 3, 224, 224), verbose=False):
     """
     Verify that the ONNX model produces the same output as the PyTorch model.
 
     Args:
         onnx_path: Path to the ONNX model
         input_shape: Input shape for testing
+        verbose: Whether ONNX Runtime logs info messages
     """
     try:
         import onnxruntime
@@ -189,32 +572,41 @@ def verify_onnx_model(onnx_path, input_shape=(1, 3, 224, 224)):
         # Create random input data
         input_data = np.random.randn(*input_shape).astype(np.float32)
 
-        # Create ONNX Runtime session
-        sess_options = onnxruntime.SessionOptions()
-        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
-        
-        providers = ['CPUExecutionProvider']
-        if 'CUDAExecutionProvider' in onnxruntime.get_available_providers():
-            providers.insert(0, 'CUDAExecutionProvider')
-            
-        ort_session = onnxruntime.InferenceSession(
-            onnx_path, 
-            sess_options=sess_options,
-            providers=providers
-        )
+        ort_session = get_verify_session(onnx_path, verbose)
+
+        # Bind input and output on the device the model runs on, so ORT
+        # doesn't copy them between host and GPU around the graph
+        io_binding = ort_session.io_binding()
+        input_name = ort_session.get_inputs()[0].name
+        output_name = ort_session.get_outputs()[0].name
+        if ort_session.get_providers()[0] == 'CUDAExecutionProvider':
+            io_binding.bind_ortvalue_input(
+                input_name, onnxruntime.OrtValue.ortvalue_from_numpy(input_data, 'cuda', 0))
+            io_binding.bind_output(output_name, 'cuda', 0)
+        else:
+            io_binding.bind_cpu_input(input_name, input_data)
+            io_binding.bind_output(output_name, 'cpu')
 
         # Run the ONNX model
-        ort_inputs = {ort_session.get_inputs()[0].name: input_data}
-        ort_outputs = ort_session.run(None, ort_inputs)
+        ort_session.run_with_iobinding(io_binding)
+        ort_outputs = io_binding.copy_outputs_to_cpu()
 
         logger.info(f"ONNX model verified successfully")
         logger.info(f"Output shape: {ort_outputs[0].shape}")
 
         # Print example prediction
         if ort_outputs[0].shape[1] == 2:
-            def softmax(x): return np.exp(x) / \
-                np.sum(np.exp(x), axis=1, keepdims=True)
-            probabilities = softmax(ort_outputs[0])
+            def softmax(x):
+                # Subtracting the row max keeps exp from overflowing
+                x = x - x.max(axis=1, keepdims=True)
+                np.exp(x, out=x)
+                x /= x.sum(axis=1, keepdims=True)
+                return x
+            metadata = ort_session.get_modelmeta().custom_metadata_map
+            if metadata.get('output_type') == 'probabilities':
+                probabilities = ort_outputs[0]
+            else:
+                probabilities = softmax(ort_outputs[0])
             logger.info(
                 f"Example prediction [real, fake] probabilities: {probabilities[0]}")
 
@@ -236,14 +628,28 @@ def main():
                         help='Input image size (default: 224)')
     parser.add_argument('--batch_size', type=int, default=1,
                         help='Batch size (default: 1)')
-    parser.add_argument('--dynamic', action='store_true',
-                        help='Use dynamic axes for batch size')
+    parser.add_argument('--no_dynamic', action='store_true',
+                        help='Export with a fixed batch size instead of dynamic axes')
     parser.add_argument('--no_optimize', action='store_true',
                         help='Skip ONNX optimization')
     parser.add_argument('--no_quantize', action='store_true',
                         help='Skip ONNX quantization')
+    parser.add_argument('--calibration_dir', '--calib_dir', type=str, default=None,
+                        help='Directory of representative images for static int8 quantization')
+    parser.add_argument('--quant_type', choices=['qint8', 'quint8'], default='qint8',
+                        help='Weight type of dynamic quantization (default: qint8)')
+    parser.add_argument('--fp16', action='store_true',
+                        help='Also save a half-precision model for GPU inference (<output>_fp16.onnx)')
+    parser.add_argument('--no_softmax', action='store_true',
+                        help='Output logits instead of probabilities')
+    parser.add_argument('--no_normalization', action='store_true',
+                        help='Leave the ImageNet normalization to the service instead of the model')
     parser.add_argument('--cpu', action='store_true',
                         help='Use CPU instead of CUDA')
+    parser.add_argument('--embed_preprocessing', action='store_true',
+                        help='Also save a model taking raw image bytes (<output>_e2e.onnx)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Log ONNX Runtime info messages, e.g. nodes falling back to CPU')
     args = parser.parse_args()
 
     # Create output directory if it doesn't exist
@@ -265,18 +671,22 @@ def main():
         model,
         args.output,
         input_shape=input_shape,
-        dynamic_axes=args.dynamic,
+        dynamic_axes=not args.no_dynamic,
         optimize=not args.no_optimize,
-        quantize=not args.no_quantize
+        quantize=not args.no_quantize,
+        calibration_dir=args.calibration_dir,
+        fp16=args.fp16,
+        include_softmax=not args.no_softmax,
+        include_normalization=not args.no_normalization,
+        quant_type=args.quant_type
     )
 
     # Verify the ONNX model
-    if not args.no_optimize and not args.no_quantize:
-        verify_onnx_model(args.output, input_shape)
-    else:
-        # Verify the unoptimized model
-        logger.info("Verifying unoptimized ONNX model...")
-        verify_onnx_model("model/ResNet18_unoptimized.onnx", input_shape)
+    verify_onnx_model(args.output, input_shape, args.verbose)
+
+    # Save a variant of the model with image decoding/preprocessing embedded
+    if args.embed_preprocessing:
+        add_preprocessing(args.output, args.output.replace('.onnx', '_e2e.onnx'), args.input_size)
 
     logger.info("Conversion completed successfully")
 
@@ -284,5 +694,6 @@ def main():
 if __name__ == "__main__":
     main()
     # Example usage:
-    # python convert_to_onnx.py --input model/ResNet18.pth --output model/ResNet18.onnx --input_size 224 --batch_size 1 --dynamic --no_quantize
-    # python convert_to_onnx.py --input model/ResNet18.pth --output model/ResNet18.onnx --input_size 224 --batch_size 1 --dynamic --no_optimize --no_quantize
+    # python convert_to_onnx.py --input model/ResNet18.pth --output model/ResNet18.onnx --input_size 224 --batch_size 1 --calibration_dir data/calibration
+    # python convert_to_onnx.py --input model/ResNet18.pth --output model/ResNet18.onnx --input_size 224 --batch_size 1 --no_quantize
+    # python convert_to_onnx.py --input model/ResNet18.pth --output model/ResNet18.onnx --input_size 224 --batch_size 1 --no_optimize --no_quantize
@@ -3,23 +3,36 @@ import torch
 # Path to your .pth file
 pth_file_path = "model/ResNet18.pth"
 
-# Load the .pth file
-checkpoint = torch.load(pth_file_path)
+# Load the .pth file without reading the tensor data: on the meta device
+# tensors only have a shape and dtype. weights_only refuses arbitrary pickles
+try:
+    checkpoint = torch.load(pth_file_path, map_location="meta", weights_only=True, mmap=True)
+except (TypeError, RuntimeError):
+    # Older PyTorch without mmap/meta loading, or a legacy (non-zip) checkpoint
+    checkpoint = torch.load(pth_file_path, map_location="cpu", weights_only=True)
+
+
+def print_entries(entries):
+    """Print the keys of a dict, with shape and dtype of tensor values."""
+    for key, value in entries.items():
+        if isinstance(value, torch.Tensor):
+            print(f"  {key}\t{tuple(value.shape)}\t{value.dtype}")
+        else:
+            print(f"  {key}")
+
 
 # Print the keys in the .pth file
-print("Keys in the .pth file:")
-for key in checkpoint.keys():
-    print(f"  {key}")
+if isinstance(checkpoint, dict):
+    print("Keys in the .pth file:")
+    print_entries(checkpoint)
 
 # If it's a state_dict, print its structure
-if "model_state_dict" in checkpoint:
+if isinstance(checkpoint, dict) and "model_state_dict" in checkpoint:
     print("\nModel State Dict Keys:")
-    for key in checkpoint["model_state_dict"].keys():
-        print(f"  {key}")
-elif isinstance(checkpoint, dict):
-    print("\nState Dict-like Structure Detected:")
-    for key in checkpoint.keys():
-        print(f"  {key}")
-else:
+    print_entries(checkpoint["model_state_dict"])
+elif isinstance(checkpoint, dict) and "state_dict" in checkpoint:
+    print("\nState Dict Keys:")
+    print_entries(checkpoint["state_dict"])
+elif not isinstance(checkpoint, dict):
     print("\nRaw Content of .pth file:")
-    print(checkpoint)
\ No newline at end of file
+    print(checkpoint)
@@ -1,4 +1,13 @@
+import time
+
 import requests
+
+try:
+    # Streams the multipart body instead of building it in memory
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
 # Define the API endpoint and file path
 url = "http://localhost:5555/predict"  # Replace with your API address
 # Replace with your own file path
@@ -6,25 +15,41 @@ url = "http://localhost:5555/predict"  # Replace with your API address
 # or provide the absolute path to the file
 file_path = "./tests/img/DGM4-bbc-Real2.jpg"
 # file_path = "./tests/img/DGM4-wapo-Real3.jpg"
+# Number of requests to send, the first one includes connection setup
+num_requests = 10
+
+# Reuse one keep-alive connection for all requests
+session = requests.Session()
 
 # File upload with multipart/form-data
 with open(file_path, "rb") as file:
-    # Prepare the file for upload using multipart/form-data
-    files = {"file": file}
-    # Optional, requests sets this automatically
-    # headers = {"Content-Type": "multipart/form-data"}
+    latencies = []
+    for _ in range(num_requests):
+        file.seek(0)
+        try:
+            start = time.perf_counter()
+            # Send POST request to the API
+            if MultipartEncoder is not None:
+                encoder = MultipartEncoder(fields={"file": ("img.jpg", file, "image/jpeg")})
+                response = session.post(url, data=encoder, headers={"Content-Type": encoder.content_type})
+            else:
+                # requests sets the multipart/form-data header automatically
+                response = session.post(url, files={"file": file})
+            latencies.append(time.perf_counter() - start)
 
-    try:
-        # Send POST request to the API
-        response = requests.post(url, files=files)
+            # Raise an exception for HTTP errors (status codes 4xx/5xx)
+            response.raise_for_status()
 
-        # Raise an exception for HTTP errors (status codes 4xx/5xx)
-        response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # Handle exceptions (e.g., connection errors, HTTP errors)
+            print(f"Request failed: {e}")
+            break
 
+    if latencies:
         # Print the response status and content
         print("Status Code:", response.status_code)
         print("Response Content:", response.text)
-
-    except requests.exceptions.RequestException as e:
-        # Handle exceptions (e.g., connection errors, HTTP errors)
-        print(f"Request failed: {e}")
+        print(f"First request: {latencies[0] * 1000:.1f} ms")
+        if len(latencies) > 1:
+            steady = latencies[1:]
+            print(f"Steady state: {sum(steady) / len(steady) * 1000:.1f} ms/request over {len(steady)} requests")
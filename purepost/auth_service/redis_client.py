@@ -0,0 +1,53 @@
+import redis
+
+from .. import settings
+
+# Initialize Redis connection pool, shared by all requests of the process.
+# Requests wait up to a second for a free connection when all are in use
+if settings.REDIS_SOCKET_PATH:
+    _redis_connection_kwargs = {
+        "connection_class": redis.UnixDomainSocketConnection,
+        "path": settings.REDIS_SOCKET_PATH,
+    }
+else:
+    _redis_connection_kwargs = {
+        "host": settings.REDIS_HOST,
+        "port": settings.REDIS_PORT,
+    }
+_redis_pool = redis.BlockingConnectionPool(
+    db=0,
+    decode_responses=True,  # Automatically decode Redis query results to strings
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=1,
+    **_redis_connection_kwargs
+)
+redis_client = redis.StrictRedis(connection_pool=_redis_pool)
+
+# Delete a verification code if it matches, in a single round trip. A wrong
+# code leaves the stored one in place, as a separate GET and DEL did
+_consume_code_script = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def consume_verification_code(redis_key, code):
+    """
+    Check a verification code against the one stored in Redis, deleting it
+    if they match.
+
+    Args:
+        redis_key: Redis key of the stored code
+        code: Code given by the user
+
+    Returns:
+        bool: True if the code matched and was deleted
+    """
+    if code is None:
+        return False
+    # Codes may arrive as JSON numbers, Redis stores them as strings. The
+    # comparison runs inside Redis, so its timing isn't observable next to
+    # the network round trip
+    return _consume_code_script(keys=[redis_key], args=[str(code)]) == 1
@@ -1,4 +1,4 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 User = get_user_model()
@@ -17,11 +17,25 @@ class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+    # Columns of the user checked here and returned by LoginView, with the
+    # API token loaded in the same query
+    LOGIN_FIELDS = (
+        'id', 'username', 'email', 'password', 'is_active', 'is_staff',
+        'is_verified', 'is_private', 'auth_token__key', 'auth_token__user',
+        'auth_token__created',
+    )
+
     def validate(self, data):
-        user = authenticate(username=data['username'], password=data['password'])
-        if not user:
-            raise serializers.ValidationError("Invalid credentials")
-        return user
+        # Same checks as authenticate() with the model backend, which would
+        # load the whole user row and not its token
+        user = User.objects.select_related('auth_token').only(
+            *self.LOGIN_FIELDS).filter(username=data['username']).first()
+        if user is None:
+            # Hash the password anyway, so unknown usernames take as long
+            User().set_password(data['password'])
+        elif user.check_password(data['password']) and user.is_active:
+            return user
+        raise serializers.ValidationError("Invalid credentials")
 
 class DeleteAccountSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
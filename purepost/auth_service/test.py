@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -18,6 +20,44 @@ class AuthTests(APITestCase):
         response = self.client.post('/auth/login/', {"username": "testuser", "password": "testpassword"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_login_loads_token_with_user(self):
+        # The user and the existing token are read in one query
+        with self.assertNumQueries(1):
+            response = self.client.post('/auth/login/', {"username": "testuser", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["token"], self.token.key)
+        self.assertEqual(response.data["user"]["email"], "test@example.com")
+
+    def test_login_creates_token(self):
+        self.token.delete()
+        response = self.client.post('/auth/login/', {"username": "testuser", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["token"], Token.objects.get(user=self.user).key)
+
+    def test_login_invalid_credentials(self):
+        response = self.client.post('/auth/login/', {"username": "testuser", "password": "wrongpassword"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/auth/login/', {"username": "nobody", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        response = self.client.post('/auth/login/', {"username": "testuser", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("purepost.auth_service.views.consume_verification_code", return_value=True)
+    def test_reset_password(self, consume_code):
+        response = self.client.put('/auth/forget/', {"email": "test@example.com", "code": "code", "new_password": "newpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        consume_code.assert_called_once_with("forget_password_verification:test@example.com", "code")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpassword"))
+
+    @patch("purepost.auth_service.views.consume_verification_code", return_value=True)
+    def test_reset_password_unknown_email(self, consume_code):
+        response = self.client.put('/auth/forget/', {"email": "nobody@example.com", "code": "code", "new_password": "newpassword"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_delete_account(self):
         self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
         response = self.client.post('/auth/delete-account/', {"password": "testpassword"})
@@ -1,25 +1,20 @@
-import random
+import secrets
 from datetime import timedelta
 
-import redis
 from django.contrib.auth import logout
-from rest_framework import status, permissions
+from rest_framework import permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from .serializers import RegisterSerializer, LoginSerializer, DeleteAccountSerializer, UserSerializer
 
 from .models import User
-from .. import settings
+from .redis_client import redis_client, consume_verification_code
 from ..notification_service.utils import send_email_async
 
-# Initialize Redis connection
-redis_client = redis.StrictRedis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=0,
-    decode_responses=True  # Automatically decode Redis query results to strings
-)
+# Password rules of registration, to validate new passwords without building
+# a serializer per request
+password_field = RegisterSerializer().fields["password"]
 
 
 class RegisterView(APIView):
@@ -39,7 +34,11 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data
-            token, _ = Token.objects.get_or_create(user=user)
+            # The token was loaded with the user by LoginSerializer
+            try:
+                token = user.auth_token
+            except Token.DoesNotExist:
+                token, _ = Token.objects.get_or_create(user=user)
             return Response(
                 {
                     "token": token.key,
@@ -61,7 +60,11 @@ class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        Token.objects.filter(user=request.user).delete()
+        if isinstance(request.auth, Token):
+            # Authenticated with the token itself, delete it by primary key
+            request.auth.delete()
+        else:
+            Token.objects.filter(user=request.user).delete()
         return Response(
             {"message": "Logout successfully"},
             status=status.HTTP_200_OK
@@ -145,7 +148,7 @@ class UserVisibilityView(APIView):
             return Response({"error": "isPrivate is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         request.user.is_private = is_private
-        request.user.save()
+        request.user.save(update_fields=['is_private'])
         return Response({"message": "Visibility updated"}, status=status.HTTP_200_OK)
 
     def put(self, request):
@@ -168,7 +171,7 @@ class EmailVerificationView(APIView):
             )
 
         # Generate a random 6-digit code
-        verification_code = random.randint(100000, 999999)
+        verification_code = 100000 + secrets.randbelow(900000)
 
         # Set Redis key for the verification code with a 10-minute TTL
         minute_ttl = 10
@@ -176,8 +179,11 @@ class EmailVerificationView(APIView):
         redis_ttl = timedelta(minutes=minute_ttl)
         redis_client.setex(redis_key, redis_ttl, verification_code)
 
-        # Send the verification code via email
-        send_email_async(
+        # Send the verification code via email from a Celery worker, so the
+        # response doesn't wait for SMTP. The task is published here rather
+        # than buffered in the process and published in batches: a worker
+        # killed with the buffer would lose the code
+        send_email_async.delay(
             subject="Your Verification Code",
             to_email=[user.email],
             template_name="emails/verify_email.html",
@@ -205,12 +211,10 @@ class EmailVerificationView(APIView):
         # Get the code from query params
         verification_code = request.data.get("code")
 
-        # Retrieve the verification code from Redis
+        # Validate the verification code against the one in Redis, removing
+        # it on success
         redis_key = f"email_verification:{user.id}"
-        stored_code = redis_client.get(redis_key)
-
-        # Validate stored_code against verification_code
-        if stored_code is None or stored_code != verification_code:
+        if not consume_verification_code(redis_key, verification_code):
             return Response(
                 {"error": "Verification code is invalid or expired"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -218,10 +222,8 @@ class EmailVerificationView(APIView):
 
         # Marked user as verified
         user.is_verified = True
-        user.save()
+        user.save(update_fields=['is_verified'])
 
-        # Remove the code from Redis after successful verification
-        redis_client.delete(redis_key)
         return Response(
             {"message": "Verification successful"},
             status=status.HTTP_200_OK
@@ -233,20 +235,16 @@ class ForgetPasswordView(APIView):
     def post(request):
         # Find user with the given email
         user_email = request.query_params.get("email")
-        user = User.objects.filter(email=user_email).first()
-        if not user:
+        # Only the username is needed, for the email
+        username = User.objects.filter(email=user_email).values_list("username", flat=True).first()
+        if username is None:
             return Response(
                 {"error": "User with the provided email does not exist."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Generate a random 16-character string as the verification code
-        verification_code = ''.join(
-            random.choices(
-                'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789',
-                k=16
-            )
-        )
+        # Generate a random 16-character URL-safe string as the verification code
+        verification_code = secrets.token_urlsafe(12)[:16]
 
         # Set Redis key for the verification code with a 5-minute TTL
         minute_ttl = 5
@@ -255,12 +253,12 @@ class ForgetPasswordView(APIView):
         redis_client.setex(redis_key, redis_ttl, verification_code)
 
         # Send the verification code via email
-        send_email_async(
+        send_email_async.delay(
             subject="Password Reset Verification Code",
             to_email=[user_email],
             template_name="emails/forget_password.html",
             context={
-                "username": user.username,
+                "username": username,
                 "verification_code": verification_code,
                 "ttl": f"{minute_ttl} minutes",
             },
@@ -284,21 +282,20 @@ class ForgetPasswordView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Validate the new password using RegisterSerializer
-        password_validation_data = {"password": new_password}
-        password_serializer = RegisterSerializer(data=password_validation_data, partial=True)
-        if not password_serializer.is_valid():
+        # Validate the new password with RegisterSerializer's password field
+        try:
+            password_field.run_validation(new_password)
+        except serializers.ValidationError as e:
             return Response(
-                password_serializer.errors,
+                {"password": e.detail},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         # Get the Redis key based on the user's email
         redis_key = f"forget_password_verification:{user_email}"
 
-        # Check if the code exists in Redis
-        stored_code = redis_client.get(redis_key)
-        if stored_code is None or stored_code != verification_code:
+        # Check the code against the one in Redis, removing it on success
+        if not consume_verification_code(redis_key, verification_code):
             return Response(
                 {"error": "Invalid or expired verification code."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -313,10 +310,7 @@ class ForgetPasswordView(APIView):
             )
 
         user.set_password(new_password)
-        user.save()
-
-        # Delete the verification code from Redis
-        redis_client.delete(redis_key)
+        user.save(update_fields=["password"])
 
         return Response(
             {"message": "Password updated successfully."},
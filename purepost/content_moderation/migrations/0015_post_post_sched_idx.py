@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 16:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0014_post_scheduled_for_alter_post_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'scheduled')), fields=['scheduled_for'], name='post_sched_idx'),
+        ),
+    ]
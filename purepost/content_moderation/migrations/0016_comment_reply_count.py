@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 16:40
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_replies(apps, schema_editor):
+    Comment = apps.get_model('content_moderation', 'Comment')
+    replies = Comment.objects.filter(parent=models.OuterRef('pk')).values(
+        'parent').annotate(count=models.Count('pk')).values('count')
+    Comment.objects.update(reply_count=Coalesce(models.Subquery(replies), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0015_post_post_sched_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_replies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# GIN index on the tags of posts for tags__contains lookups, only on
+# PostgreSQL: other databases have no GIN indexes nor JSON containment
+CREATE_TAGS_INDEX = (
+    'CREATE INDEX IF NOT EXISTS post_tags_gin '
+    'ON content_moderation_post USING GIN (tags)'
+)
+DROP_TAGS_INDEX = 'DROP INDEX IF EXISTS post_tags_gin'
+
+
+def create_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TAGS_INDEX)
+
+
+def drop_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TAGS_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0016_comment_reply_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tags_index, drop_tags_index),
+    ]
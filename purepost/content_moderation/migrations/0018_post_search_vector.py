@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 16:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# On PostgreSQL, index the search document of posts with GIN and keep it up
+# to date with a trigger on content and caption, then fill it for the
+# existing posts
+CREATE_SEARCH_VECTOR = [
+    'CREATE INDEX IF NOT EXISTS post_search_gin '
+    'ON content_moderation_post USING GIN (search_vector)',
+    'CREATE TRIGGER post_search_vector_update '
+    'BEFORE INSERT OR UPDATE OF content, caption ON content_moderation_post '
+    'FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger('
+    "search_vector, 'pg_catalog.english', content, caption)",
+    'UPDATE content_moderation_post SET search_vector = '
+    "to_tsvector('pg_catalog.english', coalesce(content, '') || ' ' || coalesce(caption, ''))",
+]
+DROP_SEARCH_VECTOR = [
+    'DROP TRIGGER IF EXISTS post_search_vector_update ON content_moderation_post',
+    'DROP INDEX IF EXISTS post_search_gin',
+]
+
+
+def create_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_SEARCH_VECTOR:
+            schema_editor.execute(sql)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_SEARCH_VECTOR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0017_post_tags_gin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
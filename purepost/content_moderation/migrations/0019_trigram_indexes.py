@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Trigram GIN indexes for the case-insensitive substring searches of folder
+# names and post captions, only on PostgreSQL. They index UPPER() of the
+# columns, as icontains compares UPPER(column) LIKE UPPER(pattern).
+CREATE_TRIGRAM_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS folder_name_trgm '
+    'ON content_moderation_folder USING GIN (UPPER(name) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS post_caption_trgm '
+    'ON content_moderation_post USING GIN (UPPER(caption) gin_trgm_ops)',
+]
+DROP_TRIGRAM_INDEXES = [
+    'DROP INDEX IF EXISTS folder_name_trgm',
+    'DROP INDEX IF EXISTS post_caption_trgm',
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_TRIGRAM_INDEXES:
+            schema_editor.execute(sql)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_TRIGRAM_INDEXES:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0018_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
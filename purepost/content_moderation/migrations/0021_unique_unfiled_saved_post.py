@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 16:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_duplicate_unfiled(apps, schema_editor):
+    # Keep only the oldest save of a post without a folder by each user, the
+    # constraint below rejects the others
+    SavedPost = apps.get_model('content_moderation', 'SavedPost')
+    unfiled = SavedPost.objects.filter(folder__isnull=True)
+    oldest = unfiled.filter(
+        user=models.OuterRef('user'), post=models.OuterRef('post')
+    ).order_by('created_at', 'pk').values('pk')[:1]
+    unfiled.exclude(pk=models.Subquery(oldest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0020_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_unfiled, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='savedpost',
+            constraint=models.UniqueConstraint(condition=models.Q(('folder__isnull', True)), fields=('user', 'post'), name='unique_unfiled_saved_post'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 16:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_moderation', '0022_post_tags_pathops'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['post', 'status'], name='report_post_status'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at'], name='report_pending_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db.models import Q
+from django.db.models.functions import Greatest
 
 
 class Post(models.Model):
@@ -24,6 +26,11 @@ class Post(models.Model):
         ('scheduled', 'Scheduled'),
     )
 
+    # Labels of the choices, built once instead of by each get_FOO_display()
+    _VISIBILITY_DISPLAY = dict(VISIBILITY_CHOICES)
+    _DEEPFAKE_DISPLAY = dict(DEEPFAKE_CHOICES)
+    _STATUS_DISPLAY = dict(STATUS_CHOICES)
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE, related_name="posts")
     content = models.TextField(blank=True, null=True)
@@ -55,6 +62,9 @@ class Post(models.Model):
     # Add tags field - using JSONField to store array of strings
     tags = models.JSONField(default=list, blank=True, null=True)
     scheduled_for = models.DateTimeField(blank=True, null=True)
+    # Full-text search document of content and caption, kept up to date by
+    # a trigger on PostgreSQL, unused on other databases
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # likes = models.ManyToManyField(settings.AUTH_USER_MODEL, through="Like", related_name="liked_posts")
     # shares = models.ManyToManyField(settings.AUTH_USER_MODEL, through="Share", related_name="shared_posts")
@@ -69,6 +79,13 @@ class Post(models.Model):
         indexes = [
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['visibility', 'status']),
+            # A user's posts of a status, newest first
+            models.Index(fields=['user', 'status', '-created_at'],
+                         name='post_user_status_idx'),
+            # Partial index for the scheduled posts publishing query, only
+            # covers the few posts still waiting to be published
+            models.Index(fields=['scheduled_for'], condition=Q(status='scheduled'),
+                         name='post_sched_idx'),
         ]
 
     def __str__(self):
@@ -76,6 +93,15 @@ class Post(models.Model):
         status_text = f" ({self.get_status_display()})" if self.status != 'published' else ""
         return f"Post by {self.user.username} at {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
+    def get_visibility_display(self):
+        return self._VISIBILITY_DISPLAY.get(self.visibility, self.visibility)
+
+    def get_deepfake_status_display(self):
+        return self._DEEPFAKE_DISPLAY.get(self.deepfake_status, self.deepfake_status)
+
+    def get_status_display(self):
+        return self._STATUS_DISPLAY.get(self.status, self.status)
+
     def save(self, *args, **kwargs):
         """Override save method to handle image/video mutual exclusivity"""
         # Ensure at least content, image, or video is present for non-draft
@@ -92,6 +118,39 @@ class Post(models.Model):
 
         super().save(*args, **kwargs)
 
+    @classmethod
+    def add_to_counter(cls, pk, field, amount):
+        """
+        Add to a counter of a post with a single UPDATE, without loading and
+        re-saving the post. The counter doesn't go below 0.
+
+        Args:
+            pk: Primary key of the post
+            field: Name of the counter, e.g. 'like_count'
+            amount: Amount to add, negative to subtract
+
+        Returns:
+            int: Number of updated posts
+        """
+        return cls.objects.filter(pk=pk).update(
+            **{field: Greatest(models.F(field) + amount, 0)})
+
+    @classmethod
+    def incr_like(cls, pk):
+        return cls.add_to_counter(pk, 'like_count', 1)
+
+    @classmethod
+    def decr_like(cls, pk):
+        return cls.add_to_counter(pk, 'like_count', -1)
+
+    @classmethod
+    def incr_share(cls, pk):
+        return cls.add_to_counter(pk, 'share_count', 1)
+
+    @classmethod
+    def incr_comment(cls, pk):
+        return cls.add_to_counter(pk, 'comment_count', 1)
+
 
 class Folder(models.Model):
     """Folder model - Users can create folders to organize saved posts"""
@@ -138,7 +197,17 @@ class SavedPost(models.Model):
         # Ensure users cannot save the same post to the same folder multiple times
         constraints = [
             models.UniqueConstraint(
-                fields=['user', 'post', 'folder'], name='unique_saved_post')
+                fields=['user', 'post', 'folder'], name='unique_saved_post'),
+            # NULL folders never conflict above, so saving a post without a
+            # folder needs its own constraint
+            models.UniqueConstraint(
+                fields=['user', 'post'], condition=Q(folder__isnull=True),
+                name='unique_unfiled_saved_post'),
+        ]
+        indexes = [
+            # A user's saved posts, newest first. Lookups of a user's saved
+            # post use the unique constraint's index
+            models.Index(fields=['user', '-created_at'], name='savedpost_user_idx'),
         ]
 
     def __str__(self):
@@ -163,6 +232,11 @@ class Like(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'post'], name='unique_like')
         ]
+        indexes = [
+            # The likes of a post, newest first. Lookups of a user's like use
+            # the unique constraint's index
+            models.Index(fields=['post', '-liked_at'], name='like_post_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} liked post #{self.post.id}"
@@ -200,6 +274,8 @@ class Comment(models.Model):
     content = models.TextField()
     parent = models.ForeignKey(
         'self', on_delete=models.CASCADE, related_name="replies", null=True, blank=True)
+    # Number of direct replies, kept up to date by save() and delete()
+    reply_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -211,15 +287,32 @@ class Comment(models.Model):
     def __str__(self):
         return f"{self.user.username} commented on post #{self.post.id}"
 
+    def save(self, *args, **kwargs):
+        """Override save method to count the new reply on its parent"""
+        is_new_reply = self._state.adding and self.parent_id is not None
+        super().save(*args, **kwargs)
+        if is_new_reply:
+            Comment.objects.filter(pk=self.parent_id).update(
+                reply_count=models.F('reply_count') + 1)
+
     def delete(self, *args, **kwargs):
         """Override delete method to handle comment count and replies"""
-        # If this comment has replies, delete them first
-        if self.replies.exists():
-            self.replies.all().delete()
-
-        # Decrement the comment count on the associated post
-        self.post.comment_count = models.F('comment_count') - 1
-        self.post.save()
+        # If this comment has replies, delete them first, with their own
+        # replies
+        removed = 1
+        if self.reply_count:
+            _, deleted = self.replies.all().delete()
+            removed += deleted.get(Comment._meta.label, 0)
+
+        # Uncount the reply on its parent
+        if self.parent_id is not None:
+            Comment.objects.filter(pk=self.parent_id, reply_count__gt=0).update(
+                reply_count=models.F('reply_count') - 1)
+
+        # Decrement the comment count on the associated post by all the
+        # removed comments, in one UPDATE without loading the post
+        Post.objects.filter(pk=self.post_id).update(
+            comment_count=Greatest(models.F('comment_count') - removed, 0))
 
         # Call the superclass delete method to actually delete the comment
         super().delete(*args, **kwargs)
@@ -244,6 +337,10 @@ class Report(models.Model):
         ('rejected', 'Rejected by Admin'),
     )
 
+    # Labels of the choices, built once instead of by each get_FOO_display()
+    _REASON_DISPLAY = dict(REPORT_REASONS)
+    _STATUS_DISPLAY = dict(REPORT_STATUS)
+
     post = models.ForeignKey(
         Post, on_delete=models.SET_NULL, related_name='reports', null=True, blank=True)
     reporter = models.ForeignKey(
@@ -275,4 +372,16 @@ class Report(models.Model):
             models.Index(fields=['created_at']),
             models.Index(fields=['reporter']),
             models.Index(fields=['status', 'created_at']),
+            # The reports of a post by status, for moderation of a post
+            models.Index(fields=['post', 'status'], name='report_post_status'),
+            # Partial index of the pending reports, newest first, for the
+            # moderation queue. It stays small as reports get handled
+            models.Index(fields=['-created_at'], condition=Q(status='pending'),
+                         name='report_pending_idx'),
         ]
+
+    def get_reason_display(self):
+        return self._REASON_DISPLAY.get(self.reason, self.reason)
+
+    def get_status_display(self):
+        return self._STATUS_DISPLAY.get(self.status, self.status)
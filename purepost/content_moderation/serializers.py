@@ -1,12 +1,44 @@
+import copy
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
 from .models import Post, Folder, SavedPost, Like, Share, Comment, Report
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class CurrentUserMixin:
+    """Serializer mixin reading the user of the request once per serializer."""
+
+    @cached_property
+    def current_user(self):
+        request = self.context.get('request')
+        return request.user if request else None
+
+
+class CachedFieldsMixin:
+    """
+    Serializer mixin building the fields once per serializer class, each
+    instance gets a copy instead of introspecting the model again. Only
+    for serializers whose fields do not depend on the context.
+    """
+
+    def get_fields(self):
+        cls = type(self)
+        if '_cached_fields' not in cls.__dict__:
+            cls._cached_fields = super().get_fields()
+        return copy.deepcopy(cls._cached_fields)
+
+
+class UserSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     bio = serializers.CharField(source='user_profile.bio', read_only=True)
     profile_picture = serializers.ImageField(
         source='user_profile.avatar', read_only=True)
@@ -16,8 +48,16 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email',
                   'bio', 'profile_picture', 'is_private']
 
+    def to_representation(self, instance):
+        # Serialize each user once per serializer context, an author shows
+        # up many times in a list of posts or comments
+        cache = self.context.setdefault('_user_cache', {})
+        if instance.pk not in cache:
+            cache[instance.pk] = super().to_representation(instance)
+        return cache[instance.pk]
+
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(CurrentUserMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -27,12 +67,11 @@ class LikeSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'post', 'liked_at']
 
     def create(self, validated_data):
-        request = self.context.get('request')
-        validated_data['user'] = request.user
+        validated_data['user'] = self.current_user
         return super().create(validated_data)
 
 
-class ShareSerializer(serializers.ModelSerializer):
+class ShareSerializer(CurrentUserMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     # post = PostSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -43,12 +82,11 @@ class ShareSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'post', 'shared_at']
 
     def create(self, validated_data):
-        request = self.context.get('request')
-        validated_data['user'] = request.user
+        validated_data['user'] = self.current_user
         return super().create(validated_data)
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
 
@@ -59,13 +97,53 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'post', 'created_at', 'replies']
 
     def get_replies(self, obj):
-        return CommentSerializer(obj.replies.all(), many=True).data
+        # Load the replies of the post at once and build the thread below
+        # the comment from them, instead of a query per reply
+        replies = defaultdict(list)
+        for reply in Comment.objects.filter(
+                post_id=obj.post_id, parent__isnull=False).select_related('user__user_profile'):
+            replies[reply.parent_id].append(reply)
+        return comment_tree(replies, obj.id, self.context)
 
     def create(self, validated_data):
         return super().create(validated_data)
 
 
-class PostSerializer(serializers.ModelSerializer):
+_comment_datetime = serializers.DateTimeField()
+
+
+def comment_tree(replies, parent_id, context):
+    """
+    Serialize a comment thread as plain dicts, with the same output as
+    CommentSerializer but without building a serializer per comment.
+
+    Args:
+        replies: Comments grouped by parent id
+        parent_id: Id of the comment to serialize the replies of, None for
+            the top-level comments
+        context: Serializer context, holding the cache of serialized users
+
+    Returns:
+        list: Serialized comments with their replies
+    """
+    users = context.setdefault('_user_cache', {})
+    data = []
+    for comment in replies.get(parent_id, []):
+        if comment.user_id not in users:
+            users[comment.user_id] = UserSerializer(comment.user, context=context).data
+        data.append({
+            'id': comment.id,
+            'user': users[comment.user_id],
+            'post': comment.post_id,
+            'content': comment.content,
+            'parent': comment.parent_id,
+            'created_at': _comment_datetime.to_representation(comment.created_at),
+            'replies': comment_tree(replies, comment.id, context),
+        })
+    return data
+
+
+class PostSerializer(CachedFieldsMixin, CurrentUserMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
@@ -91,29 +169,38 @@ class PostSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # Assume there is a Like model with a ForeignKey to Post and User
-            return obj.likes.filter(user=request.user).exists()
+        user = self.current_user
+        if user and user.is_authenticated:
+            # Annotated by the views listing posts, query only for the others
+            if hasattr(obj, 'liked_by_me'):
+                return obj.liked_by_me
+            return obj.likes.filter(user=user).exists()
         return False
 
     def get_is_saved(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return SavedPost.objects.filter(user=request.user, post=obj).exists()
+        user = self.current_user
+        if user and user.is_authenticated:
+            if hasattr(obj, 'saved_by_me'):
+                return obj.saved_by_me
+            return SavedPost.objects.filter(user=user, post=obj).exists()
         return False
 
     def get_shares(self, obj):
-        from .serializers import ShareSerializer
         return ShareSerializer(obj.shares.all(), many=True).data
 
     def get_comments(self, obj):
-        from .serializers import CommentSerializer
-        return CommentSerializer(obj.comments.filter(parent=None), many=True).data
+        # Load the whole thread at once, prefetched by the views listing
+        # posts, and build the reply tree from it
+        replies = defaultdict(list)
+        for comment in obj.comments.all():
+            replies[comment.parent_id].append(comment)
+        # Comment authors are serialized without the request, so they are
+        # cached apart from the post authors, across all posts
+        context = {'_user_cache': self.context.setdefault('_comment_user_cache', {})}
+        return comment_tree(replies, None, context)
 
     def create(self, validated_data):
-        request = self.context.get('request')
-        validated_data['user'] = request.user
+        validated_data['user'] = self.current_user
         return super().create(validated_data)
 
 
@@ -159,10 +246,13 @@ class PostCreateSerializer(serializers.ModelSerializer):
             if len(tags) > 10:
                 raise serializers.ValidationError("Maximum 10 tags allowed")
 
+            # Store each tag once, in the order given
+            data['tags'] = list(dict.fromkeys(tags))
+
         return data
 
 
-class FolderSerializer(serializers.ModelSerializer):
+class FolderSerializer(CurrentUserMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     post_count = serializers.IntegerField(read_only=True)
 
@@ -173,19 +263,26 @@ class FolderSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at', 'post_count']
 
     def create(self, validated_data):
-        request = self.context.get('request')
-        validated_data['user'] = request.user
-        return super().create(validated_data)
-
-    def validate_name(self, value):
-        request = self.context.get('request')
-        if Folder.objects.filter(user=request.user, name=value).exists():
+        validated_data['user'] = self.current_user
+        with self.unique_name():
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with self.unique_name():
+            return super().update(instance, validated_data)
+
+    @contextmanager
+    def unique_name(self):
+        """Turn the unique folder name constraint error into a validation error"""
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError:
             raise serializers.ValidationError(
-                "You already have a folder with this name")
-        return value
+                {'name': ["You already have a folder with this name"]})
 
 
-class SavedPostSerializer(serializers.ModelSerializer):
+class SavedPostSerializer(CurrentUserMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     post = PostSerializer(read_only=True)
     post_id = serializers.PrimaryKeyRelatedField(
@@ -205,36 +302,33 @@ class SavedPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = SavedPost
         fields = ['id', 'user', 'post', 'post_id',
-                  'folder', 'folder_id', 'created_at', 'updated_at', 'created_at', 'updated_at']
+                  'folder', 'folder_id', 'created_at', 'updated_at']
         read_only_fields = ['user', 'post',
                            
-                            'folder', 'created_at', 'updated_at', 'created_at', 'updated_at']
+                            'folder', 'created_at', 'updated_at']
 
     def validate_folder_id(self, value):
-        if value and value.user != self.context['request'].user:
+        # Compare the owner id, without loading the owner of the folder
+        if value and value.user_id != getattr(self.current_user, 'pk', None):
             raise serializers.ValidationError(
                 "You don't have permission to save to this folder")
         return value
 
-    def validate(self, data):
-        request = self.context.get('request')
-        post = data.get('post')
-        folder = data.get('folder')
-
-        if SavedPost.objects.filter(user=request.user, post=post, folder=folder).exists():
+    def create(self, validated_data):
+        validated_data['user'] = self.current_user
+        # The unique constraints reject saving a post twice, instead of
+        # checking for it with another query first
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            folder = validated_data.get('folder')
             if folder:
-                raise serializers.ValidationError(
-                    f"Post already saved in folder '{folder.name}'")
+                message = f"Post already saved in folder '{folder.name}'"
             else:
-                raise serializers.ValidationError(
-                    "Post already saved without a folder")
-
-        return data
-
-    def create(self, validated_data):
-        request = self.context.get('request')
-        validated_data['user'] = request.user
-        return super().create(validated_data)
+                message = "Post already saved without a folder"
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [message]})
 
 
 class SavedPostListSerializer(serializers.ModelSerializer):
@@ -249,7 +343,7 @@ class SavedPostListSerializer(serializers.ModelSerializer):
         return obj.folder.name if obj.folder else "No Folder"
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(CurrentUserMixin, serializers.ModelSerializer):
     reporter = UserSerializer(read_only=True)
     post = PostSerializer(read_only=True)
     post_id = serializers.IntegerField(write_only=True)
@@ -267,11 +361,21 @@ class ReportSerializer(serializers.ModelSerializer):
 
 
     def validate(self, data):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            if Report.objects.filter(post_id=data['post_id'], reporter=request.user).exists():
-                raise serializers.ValidationError(
-                    "You have already reported this post")
+        # Load the post and whether the user already reported it at once
+        user = self.current_user
+        posts = Post.objects.select_related('user').filter(pk=data['post_id'])
+        if user and user.is_authenticated:
+            posts = posts.annotate(already_reported=Exists(
+                Report.objects.filter(post=OuterRef('pk'), reporter=user)))
+        post = posts.first()
+        if post is None:
+            raise NotFound("Post not found")
+        if getattr(post, 'already_reported', False):
+            raise serializers.ValidationError(
+                "You have already reported this post")
+        # Reported post, saved with the report without loading it again
+        del data['post_id']
+        data['post'] = post
         return data
 
 
@@ -305,7 +409,7 @@ class ReportMiniSerializer(serializers.ModelSerializer):
     post_id = serializers.SerializerMethodField()
 
     def get_post_id(self, obj):
-        return obj.post.id if obj.post else None
+        return obj.post_id
     reason_display = serializers.CharField(
         source='get_reason_display', read_only=True)
     status_display = serializers.CharField(
@@ -1,14 +1,14 @@
 from django.db.models.signals import post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from .models import Like, Comment, Share, Report, Post
-from purepost.notification_service.utils import send_notification
+from purepost.notification_service.utils import queue_notification
 
 
 @receiver(post_save, sender=Like)
 def like_notification(sender, instance, created, **kwargs):
     if created:  # Only send notification for new likes
-        send_notification(
-            instance.post.user.user_profile,
+        queue_notification(
+            instance.post.user_id,
             'like',
             f"{instance.user.username} liked your post",
             instance.post
@@ -19,8 +19,8 @@ def like_notification(sender, instance, created, **kwargs):
 def comment_notification(sender, instance, created, **kwargs):
     if created:
         # Send notification to the post owner
-        send_notification(
-            instance.post.user.user_profile,
+        queue_notification(
+            instance.post.user_id,
             'comment',
             f"{instance.user.username} commented on your post",
             instance.post
@@ -31,8 +31,8 @@ def comment_notification(sender, instance, created, **kwargs):
 def share_notification(sender, instance:Comment, created, **kwargs):
     if created:
         # Send notification to the post owner
-        send_notification(
-            instance.post.user.user_profile,
+        queue_notification(
+            instance.post.user_id,
             'share',
             f"{instance.user.username} shared your post",
             instance.post
@@ -47,16 +47,16 @@ def report_notification(sender, instance:Report, created, **kwargs):
         
         # check if the status is "resolved" and action_taken is not None
         if instance.status == "resolved" and instance.action_taken:
-            send_notification(
-                instance.reporter.user_profile,
+            queue_notification(
+                instance.reporter_id,
                 "report",
                 f"Your report on {post_username}'s post has been resolved. Action taken: {instance.action_taken}.",
                 instance.post
             )
         # handle other statuses
         else:
-            send_notification(
-                instance.reporter.user_profile,
+            queue_notification(
+                instance.reporter_id,
                 "report",
                 f"Your report on {post_username}'s post is currently {instance.status.lower()}.",
                 instance.post
@@ -64,23 +64,28 @@ def report_notification(sender, instance:Report, created, **kwargs):
 
 
 @receiver(pre_save, sender=Report)
-def store_old_status(sender, instance, **kwargs):
-    # Only store the old status if the instance is being updated
-    if instance.pk:
-        old_instance = Report.objects.get(pk=instance.pk)
-        # Add a temporary attribute to store the old status
-        instance._old_status = old_instance.status
+def store_old_status(sender, instance, update_fields=None, **kwargs):
+    # Only store the old status if the status of the instance may be updated
+    if instance.pk and (update_fields is None or 'status' in update_fields):
+        # Add a temporary attribute to store the old status, only reading
+        # that column
+        instance._old_status = Report.objects.filter(
+            pk=instance.pk).values_list('status', flat=True).first()
 
 
-@receiver(post_save, sender=Report)
-def fill_post_author_username(sender, instance, created, **kwargs):
-    if created and instance.post and instance.post.user:
+@receiver(pre_save, sender=Report)
+def fill_post_author_username(sender, instance, **kwargs):
+    # Back up the username of the post author in the INSERT of the report
+    if instance._state.adding and instance.post and instance.post.user:
         instance.post_author_username = instance.post.user.username
-        instance.save(update_fields=['post_author_username'])
+
+
+@receiver(post_save, sender=Report)
+def report_created_notification(sender, instance, created, **kwargs):
     if created:
         post_username = instance.post.user.username if instance.post else instance.post_author_username
-        send_notification(
-            instance.reporter.user_profile,
+        queue_notification(
+            instance.reporter_id,
             "report",
             f"We' ve received your report on {post_username}'s post.",
             instance.post
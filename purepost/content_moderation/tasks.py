@@ -0,0 +1,49 @@
+import logging
+
+from celery import shared_task
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of posts published by one UPDATE
+PUBLISH_BATCH_SIZE = 1000
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    soft_time_limit=250,
+    time_limit=300,
+    name="publish_scheduled_posts"
+)
+def publish_scheduled_posts(self) -> int:
+    """
+    Publish the posts whose scheduled time has come, run every minute by
+    celery beat.
+
+    The posts are published and backdated to their scheduled time by UPDATEs
+    of up to PUBLISH_BATCH_SIZE posts, which bound the rows locked at once.
+    Each UPDATE checks the status again, so concurrent runs don't publish a
+    post twice.
+
+    Returns:
+        int: Number of published posts
+    """
+    due = Post.objects.filter(status='scheduled', scheduled_for__lte=timezone.now())
+    count = 0
+    while True:
+        batch = due.order_by().values('pk')[:PUBLISH_BATCH_SIZE]
+        published = due.filter(pk__in=batch).update(
+            status='published', created_at=F('scheduled_for'))
+        count += published
+        if published < PUBLISH_BATCH_SIZE:
+            break
+
+    if count > 0:
+        logger.info(f"Published {count} scheduled posts")
+    else:
+        logger.debug("No scheduled posts to publish at this time")
+    return count
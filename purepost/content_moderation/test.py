@@ -1,8 +1,16 @@
+from django.conf import settings
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Post, Folder, SavedPost, Comment, Like, Share
+from .models import Post, Folder, SavedPost, Comment, Like, Share, Report
+from .serializers import CommentSerializer
+from . import tasks
+from datetime import timedelta
+from django.utils import timezone
+from unittest.mock import patch
 import tempfile
 from PIL import Image
 import json
@@ -69,6 +77,26 @@ class ModelTestCase(TestCase):
             # Same name as existing
             Folder.objects.create(user=self.user, name='Test Folder')
 
+    def test_comment_replies_serialized_in_one_query(self):
+        """Test serializing a comment loads its whole reply thread at once"""
+        comment = Comment.objects.create(user=self.user, post=self.post, content='Comment')
+        reply = Comment.objects.create(
+            user=self.user, post=self.post, content='Reply', parent=comment)
+        Comment.objects.create(
+            user=self.user, post=self.post, content='Nested reply', parent=reply)
+        Comment.objects.create(
+            user=self.user, post=self.post, content='Other comment')
+        comment = Comment.objects.select_related('user__user_profile').get(pk=comment.pk)
+
+        with self.assertNumQueries(1):
+            data = CommentSerializer(comment).data
+
+        self.assertEqual([r['content'] for r in data['replies']], ['Reply'])
+        nested = data['replies'][0]['replies']
+        self.assertEqual([r['content'] for r in nested], ['Nested reply'])
+        self.assertEqual(nested[0]['parent'], reply.id)
+        self.assertEqual(nested[0]['replies'], [])
+
     def test_unique_saved_post_constraint(self):
         """Test unique saved post constraint"""
         with self.assertRaises(Exception):  # Django will raise an integrity error
@@ -143,6 +171,22 @@ class PostAPITestCase(APITestCase):
         self.assertEqual(Post.objects.latest(
             'created_at').content, 'New post content')
 
+    def test_create_post_with_duplicate_tags(self):
+        """Test creating a post stores each of its tags once"""
+        self.client.force_authenticate(user=self.user1)
+        data = {'content': 'Tagged post', 'tags': ['b', 'a', 'b', 'a']}
+        response = self.client.post(reverse('post-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=response.data['id']).tags, ['b', 'a'])
+
+    def test_create_post_with_too_many_tags(self):
+        """Test more than 10 tags are rejected, counting duplicates (should fail)"""
+        self.client.force_authenticate(user=self.user1)
+        data = {'content': 'Tagged post', 'tags': ['a', 'b'] * 6}
+        response = self.client.post(reverse('post-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Post.objects.count(), 2)
+
     def test_update_post_owner(self):
         """Test updating a post by its owner"""
         self.client.force_authenticate(user=self.user1)
@@ -205,6 +249,20 @@ class PostAPITestCase(APITestCase):
         self.public_post.refresh_from_db()
         self.assertEqual(self.public_post.like_count, 1)
 
+    def test_like_post_twice(self):
+        """Test liking a post twice is rejected without counting the like again"""
+        self.client.force_authenticate(user=self.user2)
+        url = reverse('post-like', kwargs={'pk': self.public_post.id})
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'You have already liked this post')
+
+        # Verify the like is stored and counted once
+        self.assertEqual(Like.objects.filter(user=self.user2, post=self.public_post).count(), 1)
+        self.public_post.refresh_from_db()
+        self.assertEqual(self.public_post.like_count, 1)
+
     def test_unlike_post(self):
         """Test unliking a post"""
         # First like the post
@@ -253,6 +311,37 @@ class PostAPITestCase(APITestCase):
         # Verify the content of the comment
         self.assertEqual(self.public_post.comments.last().content, 'This is a test comment.')
 
+    def test_retrieve_post_comment_threads(self):
+        """Test the comments of a retrieved post are nested by reply, oldest first"""
+        comment = Comment.objects.create(user=self.user2, post=self.public_post, content="Comment")
+        first = Comment.objects.create(user=self.user1, post=self.public_post, content="First reply", parent=comment)
+        second = Comment.objects.create(user=self.user2, post=self.public_post, content="Second reply", parent=comment)
+        nested = Comment.objects.create(user=self.user2, post=self.public_post, content="Nested reply", parent=first)
+
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.get(
+            reverse('post-detail', kwargs={'pk': self.public_post.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Verify only top-level comments are listed, with their replies in order
+        comments = response.data['comments']
+        self.assertEqual([c['id'] for c in comments], [comment.id])
+        self.assertIsNone(comments[0]['parent'])
+        replies = comments[0]['replies']
+        self.assertEqual([r['id'] for r in replies], [first.id, second.id])
+        self.assertEqual([r['parent'] for r in replies], [comment.id, comment.id])
+        self.assertEqual([r['id'] for r in replies[0]['replies']], [nested.id])
+        self.assertEqual(replies[0]['replies'][0]['replies'], [])
+        self.assertEqual(replies[1]['replies'], [])
+
+        # Verify the comment authors, serialized without the request, have
+        # relative avatar URLs
+        self.assertEqual(replies[0]['user']['username'], 'user1')
+        self.assertEqual(replies[0]['user']['id'], self.user1.id)
+        for author in (comments[0]['user'], replies[0]['user'], replies[0]['replies'][0]['user']):
+            self.assertEqual(author['profile_picture'], f"{settings.MEDIA_URL}avatars/defaults.png")
+
 
     def test_delete_comment(self):
         """Test deleting a comment"""
@@ -335,6 +424,49 @@ class PostAPITestCase(APITestCase):
         self.public_post.refresh_from_db()
         self.assertEqual(self.public_post.comment_count, 0)
 
+    def test_delete_reply_without_replies(self):
+        """Test deleting a reply uncounts it on its parent and post"""
+        parent = Comment.objects.create(user=self.user1, post=self.public_post, content="Parent comment")
+        reply = Comment.objects.create(user=self.user1, post=self.public_post, content="Reply", parent=parent)
+        Post.objects.filter(pk=self.public_post.pk).update(comment_count=2)
+
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.delete(
+            reverse('post-delete-comment', kwargs={'pk': self.public_post.id}),
+            data={'comment_id': reply.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Comment.objects.filter(id=reply.id).exists())
+
+        # Verify the reply is uncounted on its parent and the post
+        parent.refresh_from_db()
+        self.assertEqual(parent.reply_count, 0)
+        self.public_post.refresh_from_db()
+        self.assertEqual(self.public_post.comment_count, 1)
+
+    def test_delete_reply_with_replies(self):
+        """Test deleting a reply also uncounts its own replies on the post"""
+        parent = Comment.objects.create(user=self.user1, post=self.public_post, content="Parent comment")
+        reply = Comment.objects.create(user=self.user1, post=self.public_post, content="Reply", parent=parent)
+        nested = Comment.objects.create(user=self.user1, post=self.public_post, content="Nested reply", parent=reply)
+        Post.objects.filter(pk=self.public_post.pk).update(comment_count=3)
+
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.delete(
+            reverse('post-delete-comment', kwargs={'pk': self.public_post.id}),
+            data={'comment_id': reply.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Verify the reply and its own reply are deleted
+        self.assertFalse(Comment.objects.filter(id__in=[reply.id, nested.id]).exists())
+
+        # Verify only the parent comment is left counted
+        parent.refresh_from_db()
+        self.assertEqual(parent.reply_count, 0)
+        self.public_post.refresh_from_db()
+        self.assertEqual(self.public_post.comment_count, 1)
+
 
 class FolderAPITestCase(APITestCase):
     """Test cases for Folder API endpoints"""
@@ -388,9 +520,26 @@ class FolderAPITestCase(APITestCase):
         response = self.client.post(reverse('folder-list'), data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+        self.assertIn('name', response.data)
+
         # Verify no new folder was created
         self.assertEqual(Folder.objects.filter(user=self.user1).count(), 1)
 
+    def test_rename_folder_to_duplicate_name(self):
+        """Test renaming a folder to the name of another own folder (should fail)"""
+        Folder.objects.create(user=self.user1, name='Folder 3')
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.patch(
+            reverse('folder-detail', kwargs={'pk': self.folder1.id}),
+            {'name': 'Folder 3'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+
+        # Verify the folder kept its name
+        self.folder1.refresh_from_db()
+        self.assertEqual(self.folder1.name, 'Folder 1')
+
     def test_update_folder_owner(self):
         """Test updating a folder by its owner"""
         self.client.force_authenticate(user=self.user1)
@@ -432,6 +581,55 @@ class FolderAPITestCase(APITestCase):
         self.assertFalse(Folder.objects.filter(id=self.folder1.id).exists())
 
 
+    def save_posts_to_folder(self, count):
+        """Save count posts of user1 to folder1, returning their saves newest first"""
+        saved_posts = []
+        for i in range(count):
+            post = Post.objects.create(user=self.user1, content=f'Post {i}')
+            saved_posts.append(SavedPost.objects.create(
+                user=self.user1, post=post, folder=self.folder1))
+        return saved_posts[::-1]
+
+    def test_folder_posts_unpaginated(self):
+        """Test getting every post of a folder without asking for a page"""
+        saved_posts = self.save_posts_to_folder(25)
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(
+            reverse('folder-posts', kwargs={'pk': self.folder1.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Verify the whole folder is returned, more than a default page
+        self.assertEqual(response.data['folder']['name'], 'Folder 1')
+        self.assertEqual(
+            [saved['id'] for saved in response.data['posts']],
+            [saved.id for saved in saved_posts])
+        self.assertNotIn('next', response.data)
+
+    def test_folder_posts_paginated(self):
+        """Test getting the posts of a folder page by page"""
+        saved_posts = self.save_posts_to_folder(5)
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(
+            reverse('folder-posts', kwargs={'pk': self.folder1.id}), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['previous'])
+
+        # Follow the next links to the last page
+        ids = []
+        pages = 0
+        while True:
+            self.assertEqual(response.data['folder']['name'], 'Folder 1')
+            ids += [saved['id'] for saved in response.data['posts']]
+            pages += 1
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [saved.id for saved in saved_posts])
+
+
 class SavedPostAPITestCase(APITestCase):
     """Test cases for SavedPost API endpoints"""
 
@@ -555,6 +753,19 @@ class SavedPostAPITestCase(APITestCase):
             user=self.user1, post=self.post2, folder=self.folder1
         ).count(), 1)
 
+    def test_no_duplicate_unfiled_saves(self):
+        """Test that a post cannot be saved twice without a folder"""
+        self.client.force_authenticate(user=self.user1)
+        data = {'post_id': self.post1.id}
+        response = self.client.post(reverse('saved-post-list'), data)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['non_field_errors'], ['Post already saved without a folder'])
+        # Count should still be just one without a folder
+        self.assertEqual(SavedPost.objects.filter(
+            user=self.user1, post=self.post1, folder__isnull=True
+        ).count(), 1)
+
 
 
 class ProfileAndPostPermissionTestCase(APITestCase):
@@ -741,3 +952,189 @@ class PostInteractionViewSetTests(APITestCase):
         self.assertEqual(len(response_likes.data), 0)
         self.assertEqual(len(response_shares.data), 0)
         self.assertEqual(len(response_comments.data), 0)
+
+
+class PublishScheduledPostsTestCase(TestCase):
+    """Test cases for the publish_scheduled_posts task"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='testuser', email='test1@email.com', password='password123')
+        now = timezone.now()
+
+        # Five posts due at different times, one scheduled later and a draft
+        self.due_posts = [
+            Post.objects.create(
+                user=self.user,
+                content=f'Scheduled post {i}',
+                status='scheduled',
+                scheduled_for=now - timedelta(minutes=i + 1)
+            )
+            for i in range(5)
+        ]
+        self.future_post = Post.objects.create(
+            user=self.user,
+            content='Future post',
+            status='scheduled',
+            scheduled_for=now + timedelta(hours=1)
+        )
+        self.draft_post = Post.objects.create(
+            user=self.user, content='Draft post', status='draft')
+
+    @patch.object(tasks, 'PUBLISH_BATCH_SIZE', 2)
+    def test_publish_in_batches(self):
+        """Test publishing more due posts than fit in one batch"""
+        # Two full batches and a last partial one, one UPDATE each
+        with self.assertNumQueries(3):
+            count = tasks.publish_scheduled_posts()
+        self.assertEqual(count, 5)
+
+        # Verify every due post is published, backdated to its scheduled time
+        for post in self.due_posts:
+            post.refresh_from_db()
+            self.assertEqual(post.status, 'published')
+            self.assertEqual(post.created_at, post.scheduled_for)
+
+        # Verify the other posts are left as they were
+        self.future_post.refresh_from_db()
+        self.assertEqual(self.future_post.status, 'scheduled')
+        self.draft_post.refresh_from_db()
+        self.assertEqual(self.draft_post.status, 'draft')
+
+        # Verify a second run has nothing left to publish
+        self.assertEqual(tasks.publish_scheduled_posts(), 0)
+
+
+class PostFeedPaginationTestCase(APITestCase):
+    """Test cases for the pagination of the post feed"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='testuser', email='test1@email.com', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        # Five posts created at the same time, with different like counts
+        self.posts = [
+            Post.objects.create(
+                user=self.user, content=f'Post {i}', like_count=(i * 3) % 5)
+            for i in range(5)
+        ]
+        Post.objects.update(created_at=timezone.now())
+
+    def get_feed(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_next_and_previous_links(self):
+        """Test following the cursor links of the feed"""
+        now = timezone.now()
+        for i, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i))
+
+        first = self.get_feed(reverse('post-list'), page_size=3)
+        self.assertEqual(len(first['results']), 3)
+        self.assertIsNone(first['previous'])
+        self.assertIsNotNone(first['next'])
+        self.assertNotIn('count', first)
+
+        second = self.get_feed(first['next'])
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        self.assertIsNotNone(second['previous'])
+
+        # Verify going back returns the first page
+        previous = self.get_feed(second['previous'])
+        self.assertEqual(
+            [post['id'] for post in previous['results']],
+            [post['id'] for post in first['results']])
+
+    def test_stable_order_across_pages(self):
+        """Test posts created at the same time are ordered by id on every page"""
+        ids = []
+        data = self.get_feed(reverse('post-list'), page_size=2)
+        ids += [post['id'] for post in data['results']]
+        while data['next']:
+            data = self.get_feed(data['next'])
+            ids += [post['id'] for post in data['results']]
+
+        # Verify each post is listed once, newest id first
+        expected = sorted((post.id for post in self.posts), reverse=True)
+        self.assertEqual(ids, expected)
+
+    def test_order_by_created_at_ascending(self):
+        """Test ordering the feed by creation time, oldest first"""
+        data = self.get_feed(reverse('post-list'), ordering='created_at', page_size=2)
+        data = self.get_feed(data['next'])
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[2].id, self.posts[3].id])
+
+    def test_order_by_counter(self):
+        """Test ordering the feed by a counter pages by number"""
+        data = self.get_feed(reverse('post-list'), ordering='-like_count', page_size=2)
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(
+            [post['like_count'] for post in data['results']], [4, 3])
+
+        data = self.get_feed(data['next'])
+        self.assertEqual(
+            [post['like_count'] for post in data['results']], [2, 1])
+
+
+class ReportAPITestCase(APITestCase):
+    """Test cases for reporting posts"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.author = User.objects.create_user(
+            username='author', email='test1@email.com', password='password123')
+        self.reporter = User.objects.create_user(
+            username='reporter', email='test2@email.com', password='password123')
+        self.post = Post.objects.create(user=self.author, content='Reported post')
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reporter)
+
+    def report(self, post_id):
+        return self.client.post(
+            reverse('report-list'), {'post_id': post_id, 'reason': 'spam'})
+
+    def test_report_post(self):
+        """Test reporting a post backs up its author in the INSERT"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.report(self.post.id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['post']['id'], self.post.id)
+        self.assertEqual(response.data['post_author_username'], 'author')
+
+        report = Report.objects.get(post=self.post, reporter=self.reporter)
+        self.assertEqual(report.post_author_username, 'author')
+
+        # Verify the username is written by the INSERT, not a second UPDATE
+        report_writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT INTO "content_moderation_report"',
+                                        'UPDATE "content_moderation_report"'))
+        ]
+        self.assertEqual(len(report_writes), 1)
+        self.assertTrue(report_writes[0].startswith('INSERT'))
+        self.assertIn("'author'", report_writes[0])
+
+    def test_report_missing_post(self):
+        """Test reporting a post that does not exist (should fail)"""
+        response = self.report(self.post.id + 100)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Report.objects.exists())
+
+    def test_report_post_twice(self):
+        """Test reporting the same post twice (should fail)"""
+        self.assertEqual(self.report(self.post.id).status_code, status.HTTP_201_CREATED)
+        response = self.report(self.post.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Verify no second report was created
+        self.assertEqual(Report.objects.filter(post=self.post).count(), 1)
@@ -1,8 +1,11 @@
+import json
 import logging
+from datetime import timedelta
+from django.contrib.postgres.search import SearchQuery
+from django.db import IntegrityError, connection, transaction
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Count, Q
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
 from rest_framework import viewsets, status, permissions, filters, generics
-from rest_framework.serializers import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
@@ -10,7 +13,7 @@ from django.utils.dateparse import parse_datetime
 from django.utils.timezone import is_aware, make_aware
 from django.utils import timezone
 
-from .models import Post, Folder, SavedPost, Share, Comment, Report
+from .models import Post, Folder, SavedPost, Like, Share, Comment, Report
 from .serializers import (
     UserSerializer, PostSerializer, PostCreateSerializer,
     FolderSerializer, SavedPostSerializer, SavedPostListSerializer,
@@ -21,12 +24,98 @@ from .permissions import IsOwnerOrReadOnly, IsReporterOrAdmin
 from .throttling import ReportRateThrottle
 
 from rest_framework.pagination import PageNumberPagination
+from purepost.BaseCursorPagination import BaseCursorPagination
 from django.contrib.auth import get_user_model
 from purepost.auth_service.permissions import IsAdminUser
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Columns of a user shown by UserSerializer, leaving out the password hash and
+# the other account and profile columns
+USER_LIST_FIELDS = (
+    'username', 'email', 'is_private', 'user_profile__bio', 'user_profile__avatar',
+)
+
+# Columns of listed posts: the post's own but its search document, and those
+# of its author shown by UserSerializer
+POST_LIST_FIELDS = (
+    *(field.name for field in Post._meta.concrete_fields if field.name != 'search_vector'),
+    *(f'user__{field}' for field in USER_LIST_FIELDS),
+)
+
+# Columns of the comments of listed posts, serialized by comment_tree()
+COMMENT_LIST_FIELDS = (
+    'id', 'user', 'post', 'content', 'parent', 'created_at',
+    *(f'user__{field}' for field in USER_LIST_FIELDS),
+)
+
+
+def annotate_viewer_state(queryset, user):
+    """
+    Annotate posts with whether the user liked and saved them, read by
+    PostSerializer instead of querying per post.
+
+    Args:
+        queryset: Post queryset
+        user: User viewing the posts
+
+    Returns:
+        QuerySet: Annotated queryset, unchanged for anonymous users
+    """
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(
+        liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user=user)),
+        saved_by_me=Exists(SavedPost.objects.filter(post=OuterRef('pk'), user=user)),
+    )
+
+
+def prefetch_comments(lookup='comments'):
+    """
+    Prefetch the comments of posts with their authors, for PostSerializer to
+    build the comment threads from.
+
+    Args:
+        lookup: Path to the comments of the posts
+
+    Returns:
+        Prefetch: Lookup for prefetch_related
+    """
+    return Prefetch(lookup, queryset=Comment.objects.select_related(
+        'user__user_profile').only(*COMMENT_LIST_FIELDS))
+
+
+def listed_posts(user):
+    """
+    Posts ready for PostSerializer: with their authors and comments, and
+    whether the user liked and saved them.
+
+    Args:
+        user: User viewing the posts
+
+    Returns:
+        QuerySet: Post queryset
+    """
+    queryset = Post.objects.select_related('user', 'user__user_profile').only(
+        *POST_LIST_FIELDS).prefetch_related(prefetch_comments())
+    return annotate_viewer_state(queryset, user)
+
+
+def prefetch_posts(user, lookup='post'):
+    """
+    Prefetch the posts of saved posts or reports ready for PostSerializer,
+    see listed_posts().
+
+    Args:
+        user: User viewing the posts
+        lookup: Path to the posts
+
+    Returns:
+        Prefetch: Lookup for prefetch_related
+    """
+    return Prefetch(lookup, queryset=listed_posts(user))
+
 
 class ProfilePostPagination(PageNumberPagination):
     page_size = 10
@@ -34,6 +123,24 @@ class ProfilePostPagination(PageNumberPagination):
     max_page_size = 50
 
 
+class PostCursorPagination(BaseCursorPagination):
+    """
+    Keyset pagination of the post feed, as cheap on deep pages as on the
+    first one, unlike OFFSET. The id breaks ties between posts created at
+    the same time.
+    """
+    page_size = 10
+    max_page_size = 50
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # Break ties by id in the requested ordering too, e.g. ?ordering=created_at
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+
 class UserProfileView(generics.ListAPIView):
     """
     API endpoint to view a user's profile and posts with permission control.
@@ -42,22 +149,25 @@ class UserProfileView(generics.ListAPIView):
     pagination_class = ProfilePostPagination
 
     def get(self, request, username, *args, **kwargs):
-        user = get_object_or_404(User, username=username)
-        profile_serializer = UserSerializer(user, context={'request': request})
+        user = get_object_or_404(
+            User.objects.select_related('user_profile'), username=username)
+        # Shared by the profile and the posts, so the user is serialized once
+        # as the profile and the author of the posts
+        context = {'request': request}
+        profile_serializer = UserSerializer(user, context=context)
 
         # Check privacy settings
         if user.is_private and user != request.user:
             return Response({'detail': 'This profile is private.'}, status=403)
 
         # Retrieve visible posts
-        posts = Post.objects.filter(user=user).order_by('-created_at')
+        posts = listed_posts(request.user).filter(user=user).order_by('-created_at')
         if user != request.user:
             # Only show public posts for others
             posts = posts.filter(visibility='public')
 
         page = self.paginate_queryset(posts)
-        post_serializer = PostSerializer(
-            page, many=True, context={'request': request})
+        post_serializer = PostSerializer(page, many=True, context=context)
 
         return self.get_paginated_response({
             'profile': profile_serializer.data,
@@ -83,9 +193,23 @@ class PostViewSet(viewsets.ModelViewSet):
     search_fields = ['content', 'caption', 'tags', '=user__username']
     ordering_fields = ['created_at', 'like_count',
                        'comment_count', 'share_count']
-    ordering = ['-created_at']  # Default order by creation time descending
+    # Default order by creation time descending
+    ordering = ['-created_at', '-id']
     filter_backends = [CustomSearchFilter, filters.OrderingFilter]
-    pagination_class = ProfilePostPagination
+    pagination_class = PostCursorPagination
+    # Counters change between requests and can't key a cursor, the posts
+    # ordered by them are paginated by page number
+    counter_ordering_fields = {'like_count', 'comment_count', 'share_count'}
+
+    @property
+    def paginator(self):
+        """Page by number when ordering by a counter, else by cursor"""
+        if not hasattr(self, '_paginator'):
+            ordering = self.request.query_params.get('ordering', '')
+            if any(field.strip().lstrip('-') in self.counter_ordering_fields
+                   for field in ordering.split(',')):
+                self._paginator = ProfilePostPagination()
+        return super().paginator
 
     def get_serializer_class(self):
         """Choose appropriate serializer based on action type"""
@@ -93,10 +217,16 @@ class PostViewSet(viewsets.ModelViewSet):
             return PostCreateSerializer
         return PostSerializer
 
-    # Param options are: user_id: unknown, is_pinned: boolean.
+    # Param options are: user_id: unknown, is_pinned: boolean, tag: string,
+    # q: string.
     def get_queryset(self):
         """Filter queryset based on request parameters"""
-        queryset = Post.objects.all()
+        # Only posts read for PostSerializer need their authors, comments
+        # and like/save state, the other actions load the bare post
+        if self.action in ('list', 'retrieve'):
+            queryset = listed_posts(self.request.user)
+        else:
+            queryset = Post.objects.all()
 
         # Filter by visibility - only owner can see their private posts and drafts
         if self.request.user.is_authenticated:
@@ -130,6 +260,26 @@ class PostViewSet(viewsets.ModelViewSet):
                 )
             queryset = queryset.filter(pinned=pinned)
 
+        # Filter by tag, with the GIN index on tags on PostgreSQL. The index
+        # only serves containment (@>), so keep tag filters to tags__contains
+        tag = self.request.query_params.get('tag')
+        if tag:
+            if connection.features.supports_json_field_contains:
+                queryset = queryset.filter(tags__contains=[tag])
+            else:
+                queryset = queryset.filter(tags__icontains=json.dumps(tag))
+
+        # Full-text search of content and caption, with the GIN index on the
+        # search document on PostgreSQL
+        query = self.request.query_params.get('q')
+        if query:
+            if connection.vendor == 'postgresql':
+                queryset = queryset.filter(search_vector=SearchQuery(
+                    query, config='english', search_type='websearch'))
+            else:
+                queryset = queryset.filter(
+                    Q(content__icontains=query) | Q(caption__icontains=query))
+
         return queryset
 
     def perform_create(self, serializer):
@@ -145,21 +295,19 @@ class PostViewSet(viewsets.ModelViewSet):
         """Like a post"""
         post = self.get_object()
 
-        # Check if already liked (assuming Like model exists, adjust as needed)
-        # Comment this section if Like model is not yet implemented
-
-        if post.likes.filter(user=request.user).exists():
+        # Create like record, the unique constraint rejects liking a post
+        # twice instead of checking for it with another query first
+        try:
+            with transaction.atomic():
+                post.likes.create(user=request.user)
+        except IntegrityError:
             return Response(
                 {"detail": "You have already liked this post"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create like record
-        post.likes.create(user=request.user)
-
         # Update like count
-        post.like_count += 1
-        post.save()
+        Post.incr_like(post.pk)
 
         return Response({"detail": "Post liked successfully"}, status=status.HTTP_200_OK)
 
@@ -178,9 +326,7 @@ class PostViewSet(viewsets.ModelViewSet):
             pass
 
         # Update like count, ensure it doesn't go below 0
-        if post.like_count > 0:
-            post.like_count -= 1
-            post.save()
+        Post.decr_like(post.pk)
 
         return Response({"detail": "Post unliked successfully"}, status=status.HTTP_200_OK)
 
@@ -191,8 +337,7 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(user=request.user, post=post)
-            post.comment_count += 1
-            post.save()
+            Post.incr_comment(post.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -218,13 +363,9 @@ class PostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Delete the comment
+        # Delete the comment, which also updates the comment count on the post
         comment.delete()
 
-        # Update the comment count on the post
-        post.comment_count = max(0, post.comment_count - 1)
-        post.save()
-
         return Response(
             {"detail": "Comment deleted successfully"},
             status=status.HTTP_200_OK
@@ -245,8 +386,7 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = ShareSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save(user=request.user, post=post)
-            post.share_count += 1
-            post.save()
+            Post.incr_share(post.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -288,7 +428,7 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='draft')
     def get_draft(self, request):
         """Get the user's draft post (assuming only one draft per user)"""
-        draft = Post.objects.filter(user=request.user, status='draft').first()
+        draft = listed_posts(request.user).filter(user=request.user, status='draft').first()
         if not draft:
             return Response({"detail": "No draft found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -299,7 +439,7 @@ class PostViewSet(viewsets.ModelViewSet):
     def save_draft(self, request):
         """Save or update the user's draft post"""
         # Check if user already has a draft
-        existing_draft = Post.objects.filter(
+        existing_draft = listed_posts(request.user).filter(
             user=request.user, status='draft').first()
 
         if existing_draft:
@@ -314,7 +454,9 @@ class PostViewSet(viewsets.ModelViewSet):
             # Create new draft
             serializer = self.get_serializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(user=request.user, status='draft')
+                draft = serializer.save(user=request.user, status='draft')
+                # Nobody liked or saved a new draft yet
+                draft.liked_by_me = draft.saved_by_me = False
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -413,7 +555,7 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def admin_posts(self, request):
         """Get all posts for admin view"""
-        queryset = Post.objects.all()
+        queryset = listed_posts(request.user)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -426,26 +568,49 @@ class FolderViewSet(viewsets.ModelViewSet):
     """Folder ViewSet - Handles CRUD operations for Folder model"""
     serializer_class = FolderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    # Search folders by name, e.g. to autocomplete them
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['name']
 
     def get_queryset(self):
         """Return only folders owned by the current user"""
-        return Folder.objects.filter(user=self.request.user).annotate(
-            post_count=Count('saved_posts'))
+        return Folder.objects.filter(user=self.request.user).select_related(
+            'user', 'user__user_profile').annotate(post_count=Count('saved_posts'))
 
     def perform_create(self, serializer):
         """Set current user as owner when creating a folder"""
-        serializer.save(user=self.request.user)
+        folder = serializer.save(user=self.request.user)
+        # A new folder is empty, no need to count its posts
+        folder.post_count = 0
 
     @action(detail=True, methods=['get'])
     def posts(self, request, pk=None):
         folder = self.get_object()
-        saved_posts = SavedPost.objects.filter(folder=folder)
+        # Saved posts from the related manager share the folder fetched
+        # above, instead of joining it again for each row
+        saved_posts = folder.saved_posts.prefetch_related(prefetch_posts(request.user))
         folder_serializer = self.get_serializer(folder)
+        # The whole folder is returned unless the client asks for a page of
+        # it with cursor or page_size, then the page links sit next to the
+        # folder and its posts
+        paginated = ('cursor' in request.query_params
+                     or 'page_size' in request.query_params)
+        if not paginated:
+            post_serializer = SavedPostListSerializer(
+                saved_posts, many=True, context={'request': request})
+            return Response({
+                "folder": folder_serializer.data,
+                "posts": post_serializer.data
+            })
+
+        page = self.paginate_queryset(saved_posts)
         post_serializer = SavedPostListSerializer(
-            saved_posts, many=True, context={'request': request})
+            page, many=True, context={'request': request})
         return Response({
             "folder": folder_serializer.data,
-            "posts": post_serializer.data
+            "posts": post_serializer.data,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
         })
 
 
@@ -461,7 +626,9 @@ class SavedPostViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return only saved posts owned by the current user"""
-        queryset = SavedPost.objects.filter(user=self.request.user)
+        queryset = SavedPost.objects.filter(user=self.request.user).select_related(
+            'user__user_profile', 'folder__user__user_profile'
+        ).prefetch_related(prefetch_posts(self.request.user))
 
         # Filter by folder ID
         folder_id = self.request.query_params.get('folder_id')
@@ -475,7 +642,9 @@ class SavedPostViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Set current user as owner when creating a saved post"""
-        serializer.save(user=self.request.user)
+        saved_post = serializer.save(user=self.request.user)
+        # The user just saved the post, no need to look it up
+        saved_post.post.saved_by_me = True
 
     @action(detail=False, methods=['delete'], url_path='by-post')
     def delete_by_post(self, request):
@@ -532,6 +701,8 @@ class SavedPostViewSet(viewsets.ModelViewSet):
                 post=post,
                 folder=folder
             )
+            # The user just saved the post, no need to look it up
+            post.saved_by_me = True
             serializer = SavedPostSerializer(
                 saved_post, context={'request': request})
             return Response(
@@ -549,21 +720,24 @@ class PostInteractionViewSet(viewsets.ViewSet):
     def list_likes(self, request, pk=None):
         """Retrieve the list of users who liked a post"""
         post = get_object_or_404(Post, id=pk)
-        users = User.objects.filter(likes__post=post).distinct()
+        users = User.objects.filter(
+            likes__post=post).select_related('user_profile').only(*USER_LIST_FIELDS).distinct()
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
     def list_shares(self, request, pk=None):
         """Retrieve the list of users who shared a post."""
         post = get_object_or_404(Post, id=pk)
-        users = User.objects.filter(shares__post=post).distinct()
+        users = User.objects.filter(
+            shares__post=post).select_related('user_profile').only(*USER_LIST_FIELDS).distinct()
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
     def list_comments(self, request, pk=None):
         """Retrieve the list of users who commented on a post"""
         post = get_object_or_404(Post, id=pk)
-        users = User.objects.filter(comments__post=post).distinct()
+        users = User.objects.filter(
+            comments__post=post).select_related('user_profile').only(*USER_LIST_FIELDS).distinct()
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
@@ -597,9 +771,11 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Report.objects.select_related(
+            'reporter__user_profile').prefetch_related(prefetch_posts(user))
         if user.is_admin:
-            return Report.objects.all()
-        return Report.objects.filter(reporter=user)
+            return queryset
+        return queryset.filter(reporter=user)
 
     def get_serializer_class(self):
         if self.action == 'update' or self.action == 'partial_update':
@@ -630,17 +806,9 @@ class ReportViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """create a new report and send notification"""
         try:
-            post_id = serializer.validated_data.get('post_id')
-            post = get_object_or_404(Post, id=post_id)
-            user = self.request.user
-
-            # check if the post exists
-            if Report.objects.filter(post_id=post_id, reporter=user).exists():
-                raise ValidationError(
-                    {"non_field_errors": [_("You have already reported this post")]})
-
-            # save
-            report = serializer.save(reporter=user, post=post)
+            # The serializer checked the post exists and was not reported
+            # by the user yet
+            report = serializer.save(reporter=self.request.user)
 
             '''
             # send notification to the reporter
@@ -732,7 +900,7 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        reports = Report.objects.filter(status='pending')
+        reports = self.get_queryset().filter(status='pending')
 
         # filter by reason
         reason_filter = request.query_params.get('reason')
@@ -829,9 +997,6 @@ class ReportViewSet(viewsets.ModelViewSet):
         )
 
         # last 7 days trend
-        from django.utils import timezone
-        from datetime import timedelta
-
         today = timezone.now().date()
         seven_days_ago = today - timedelta(days=6)
 
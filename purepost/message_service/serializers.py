@@ -1,3 +1,4 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import *
 
@@ -83,7 +84,6 @@ class MessageSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def validate_sender(value):
-        from django.contrib.auth import get_user_model
         user_model = get_user_model()
         if not user_model.objects.filter(id=value).exists():
             raise serializers.ValidationError("Sender not found.")
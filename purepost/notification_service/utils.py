@@ -1,8 +1,11 @@
+import smtplib
+
 from asgiref.sync import async_to_sync
 from celery import shared_task
 from channels.layers import get_channel_layer
 from django.contrib.contenttypes.models import ContentType
 from django.core.mail import EmailMessage
+from django.db import transaction
 from django.template.loader import render_to_string
 
 from purepost import settings
@@ -18,10 +21,46 @@ def send_notification(recipient_profile, notification_type, message, related_obj
         message: str, notification message
         related_object: Optional model instance related to the notification
     """
+    return _notify(recipient_profile.pk, notification_type, message,
+                   *_related_ids(related_object))
+
+
+def queue_notification(recipient_id, notification_type, message, related_object=None):
+    """
+    Send a notification with send_notification_async once the current
+    transaction commits. Only ids are passed to the task.
+
+    Args:
+        recipient_id: Primary key of the recipient Profile, the id of its user
+        notification_type: str, one of Notification.NOTIFICATION_TYPES
+        message: str, notification message
+        related_object: Optional model instance related to the notification
+    """
+    content_type_id, object_id = _related_ids(related_object)
+    transaction.on_commit(lambda: send_notification_async.delay(
+        recipient_id, notification_type, message, content_type_id, object_id),
+        robust=True)
+
+
+@shared_task
+def send_notification_async(recipient_id, notification_type, message,
+                            content_type_id=None, object_id=None):
+    """Send a notification from a Celery worker, see queue_notification()."""
+    _notify(recipient_id, notification_type, message, content_type_id, object_id)
+
+
+def _related_ids(related_object):
+    """Content type id and object id of the object related to a notification."""
+    if related_object is None:
+        return None, None
+    return ContentType.objects.get_for_model(related_object).id, str(related_object.id)
+
+
+def _notify(recipient_id, notification_type, message, content_type_id=None, object_id=None):
     # Check if the user has disabled this notification type
     try:
         preference = NotificationPreference.objects.get(
-            profile=recipient_profile,
+            profile_id=recipient_id,
             notification_type=notification_type
         )
         if not preference.enabled:
@@ -30,18 +69,18 @@ def send_notification(recipient_profile, notification_type, message, related_obj
     except NotificationPreference.DoesNotExist:
         # If no preference exists, create one with default (enabled=True)
         NotificationPreference.objects.create(
-            profile=recipient_profile,
+            profile_id=recipient_id,
             notification_type=notification_type,
             enabled=True
         )
 
     # Create notification in database
     notification = Notification.objects.create(
-        recipient=recipient_profile,
+        recipient_id=recipient_id,
         notification_type=notification_type,
         message=message,
-        content_type=ContentType.objects.get_for_model(related_object) if related_object else None,
-        object_id=str(related_object.id) if related_object else None
+        content_type_id=content_type_id,
+        object_id=object_id
     )
 
     # Prepare notification data
@@ -52,10 +91,10 @@ def send_notification(recipient_profile, notification_type, message, related_obj
         'created_at': notification.created_at.isoformat()
     }
 
-    # Send to websocket
+    # Send to websocket, the profile of a user shares its id
     channel_layer = get_channel_layer()
     async_to_sync(channel_layer.group_send)(
-        f"notifications_{recipient_profile.user.id}",
+        f"notifications_{recipient_id}",
         {
             'type': 'notification_message',
             'notification': notification_data
@@ -65,8 +104,12 @@ def send_notification(recipient_profile, notification_type, message, related_obj
     return notification
 
 
-@shared_task
-def send_email_async(subject, to_email, template_name, context, from_email=None):
+@shared_task(bind=True, max_retries=5, autoretry_for=(smtplib.SMTPException,), retry_backoff=True)
+def send_email_async(self, subject, to_email, template_name, context, from_email=None):
+    """
+    Send an HTML email rendered from a template, run by a Celery worker.
+    Transient SMTP failures are retried with exponential backoff.
+    """
     from_email = from_email or settings.EMAIL_HOST_USER
     message = render_to_string(template_name, context)
     email = EmailMessage(subject, message, to=to_email, from_email=from_email)
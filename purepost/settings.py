@@ -34,7 +34,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    'django_apscheduler',
 
     # Third-party apps
     "rest_framework",
@@ -97,6 +96,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / "db.sqlite3",
+        # Keep connections open for DB_CONN_MAX_AGE seconds instead of
+        # connecting per request or task, checked before reuse. Set it to 0
+        # to connect per request again
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -110,6 +114,17 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "password"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        # Persistent connections, as in the configuration above
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        # TCP keepalives stop firewalls/NAT from silently dropping idle
+        # connections, such as those of long-running Celery tasks
+        "OPTIONS": {
+            "keepalives": 1,
+            "keepalives_idle": 30,
+            "keepalives_interval": 10,
+            "keepalives_count": 5,
+        },
     }
 }
 '''
@@ -117,6 +132,9 @@ DATABASES = {
 # Redis
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", 6379)
+# Unix socket of a Redis server on the same host, used instead of TCP if set
+REDIS_SOCKET_PATH = os.getenv("REDIS_SOCKET_PATH")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
 
 # Authentication and user model
 AUTH_USER_MODEL = "auth_service.User"
@@ -159,6 +177,14 @@ EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "False") == "True"
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "publish-scheduled-posts-every-minute": {
+        "task": "publish_scheduled_posts",
+        "schedule": 60.0,
+        # Drop runs that waited too long, the next one comes a minute later
+        "options": {"expires": 30},
+    },
+}
 
 # JWT settings
 SIMPLE_JWT = {
@@ -300,15 +326,4 @@ LOGGING = {
             "propagate": False,
         },
     },
-}
-
-# APScheduler settings
-SCHEDULER_CONFIG = {
-    "apscheduler.jobstores.default": {
-        "class": "django_apscheduler.jobstores:DjangoJobStore"
-    },
-    "apscheduler.executors.processpool": {
-        "type": "threadpool",
-        "max_workers": 5
-    }
 }
\ No newline at end of file
@@ -1,14 +1,14 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Follow
-from purepost.notification_service.utils import send_notification
+from purepost.notification_service.utils import queue_notification
 
 
 @receiver(post_save, sender=Follow)
 def follow_notification(sender, instance, created, **kwargs):
     if created:  # Only send notification for new likes
-        send_notification(
-            instance.following.user_profile,
+        queue_notification(
+            instance.following_id,
             'follow',
             f"{instance.follower.username} started following you",
             None
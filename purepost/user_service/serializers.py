@@ -1,3 +1,5 @@
+from datetime import date
+
 from rest_framework import serializers
 from .models import Profile
 from ..social_service.models import Follow
@@ -69,7 +71,6 @@ class ProfileSerializer(serializers.ModelSerializer):
         Custom validation for the `date_of_birth` field.
         Ensures the date of birth is not in the future.
         """
-        from datetime import date
         if value and value > date.today():
             raise serializers.ValidationError(
                 "The date of birth cannot be in the future.")
@@ -193,7 +193,9 @@ start_celery() {
     export AWS_SECRET_ACCESS_KEY=$MINIO_PASSWORD
     export AWS_STORAGE_BUCKET_NAME=$MINIO_BUCKET
 
-    celery -A $PROJECT_NAME worker -l info &
+    # -B runs celery beat in the worker, which publishes the scheduled posts
+    # every minute in place of "scheduler_commands --daemon"
+    celery -A $PROJECT_NAME worker -B -l info &
     CELERY_PID=$!
 
     sleep 2